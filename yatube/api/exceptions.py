@@ -0,0 +1,8 @@
+from http import HTTPStatus
+
+
+class ApiError(Exception):
+    def __init__(self, detail, status=HTTPStatus.BAD_REQUEST):
+        super().__init__(detail)
+        self.detail = detail
+        self.status = status
@@ -0,0 +1,114 @@
+from django.urls import reverse
+from posts.models import UserStats
+
+from .exceptions import ApiError
+
+
+def user_summary(user):
+    return {'username': user.username, 'full_name': user.get_full_name()}
+
+
+class Serializer:
+    """Turn objects into JSON-ready dicts.
+
+    ``fields`` lists what a resource exposes, in output order; a field is
+    read from ``get_<name>()`` when the serializer defines one and from
+    the attribute of the same name otherwise. ``?fields=a,b`` narrows
+    the output to a subset.
+    """
+    fields = ()
+
+    def __init__(self, request, fields=None):
+        self.request = request
+        self.selected = self.select(fields)
+
+    def select(self, fields):
+        if not fields:
+            return list(self.fields)
+        names = {name.strip() for name in fields.split(',') if name.strip()}
+        unknown = names.difference(self.fields)
+        if unknown:
+            raise ApiError(f'Неизвестные поля: {", ".join(sorted(unknown))}')
+        return [name for name in self.fields if name in names]
+
+    def absolute_url(self, location):
+        return self.request.build_absolute_uri(location)
+
+    def serialize(self, obj):
+        data = {}
+        for name in self.selected:
+            getter = getattr(self, f'get_{name}', None)
+            data[name] = getter(obj) if getter else getattr(obj, name)
+        return data
+
+
+class PostSerializer(Serializer):
+    fields = (
+        'id', 'url', 'text', 'created', 'author', 'group', 'image',
+        'comment_count',
+    )
+
+    def get_url(self, post):
+        return self.absolute_url(reverse('api:v1:post', args=(post.pk,)))
+
+    def get_author(self, post):
+        return user_summary(post.author)
+
+    def get_group(self, post):
+        if post.group is None:
+            return None
+        return {'slug': post.group.slug, 'title': post.group.title}
+
+    def get_image(self, post):
+        if not post.image:
+            return None
+        return self.absolute_url(post.image.url)
+
+
+class CommentSerializer(Serializer):
+    fields = ('id', 'post', 'text', 'created', 'author')
+
+    def get_post(self, comment):
+        return comment.post_id
+
+    def get_author(self, comment):
+        return user_summary(comment.author)
+
+
+class GroupSerializer(Serializer):
+    fields = ('slug', 'url', 'title', 'description')
+
+    def get_url(self, group):
+        return self.absolute_url(
+            reverse('api:v1:group', args=(group.slug,))
+        )
+
+
+class ProfileSerializer(Serializer):
+    fields = (
+        'username', 'url', 'full_name', 'posts_count', 'followers_count',
+        'following_count', 'is_followed',
+    )
+
+    def get_url(self, user):
+        return self.absolute_url(
+            reverse('api:v1:profile', args=(user.username,))
+        )
+
+    def get_full_name(self, user):
+        return user.get_full_name()
+
+    def count(self, user, field):
+        try:
+            return getattr(user.stats, field)
+        except UserStats.DoesNotExist:
+            return 0
+
+    def get_posts_count(self, user):
+        return self.count(user, 'posts_count')
+
+    def get_followers_count(self, user):
+        return self.count(user, 'followers_count')
+
+    def get_following_count(self, user):
+        return self.count(user, 'following_count')
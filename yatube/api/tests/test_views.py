@@ -0,0 +1,215 @@
+from http import HTTPStatus
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from posts import group_cache, timeline
+from posts.models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+@override_settings(API_PAGE_SIZE=3)
+class ApiTest(TestCase):
+    POST_COUNT = 5
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+
+        cls.author = User.objects.create_user(
+            username='author', first_name='Лев', last_name='Толстой'
+        )
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание'
+        )
+        cls.posts = [
+            Post.objects.create(
+                author=cls.author, group=cls.group, text=f'Пост {i}'
+            )
+            for i in range(cls.POST_COUNT)
+        ]
+        cls.post = cls.posts[-1]
+        for i in range(cls.POST_COUNT):
+            Comment.objects.create(
+                post=cls.post, author=cls.reader, text=f'Комментарий {i}'
+            )
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+        cls.POSTS = reverse('api:v1:posts')
+        cls.POST = reverse('api:v1:post', args=(cls.post.pk,))
+        cls.COMMENTS = reverse('api:v1:comments', args=(cls.post.pk,))
+        cls.GROUPS = reverse('api:v1:groups')
+        cls.GROUP = reverse('api:v1:group', args=(cls.group.slug,))
+        cls.GROUP_POSTS = reverse(
+            'api:v1:group_posts', args=(cls.group.slug,)
+        )
+        cls.PROFILE = reverse('api:v1:profile', args=(cls.author.username,))
+        cls.PROFILE_POSTS = reverse(
+            'api:v1:profile_posts', args=(cls.author.username,)
+        )
+        cls.FOLLOW = reverse('api:v1:follow')
+
+    def setUp(self):
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+        cache.clear()
+        group_cache.clear()
+
+    def collect(self, client, url):
+        '''Все страницы списка по ссылкам next'''
+        results = []
+        while url:
+            data = client.get(url).json()
+            results.extend(data['results'])
+            url = data['next']
+        return results
+
+    def test_post_lists(self):
+        '''Списки постов обходятся курсорами от новых к старым'''
+        texts = [post.text for post in reversed(self.posts)]
+        for url in (self.POSTS, self.GROUP_POSTS, self.PROFILE_POSTS):
+            with self.subTest(url=url):
+                results = self.collect(self.client, url)
+                self.assertEqual([post['text'] for post in results], texts)
+        results = self.collect(self.reader_client, self.FOLLOW)
+        self.assertEqual([post['text'] for post in results], texts)
+
+    def test_previous_page(self):
+        '''Ссылка previous возвращает на предыдущую страницу'''
+        first = self.client.get(self.POSTS).json()
+        self.assertIsNone(first['previous'])
+        second = self.client.get(first['next']).json()
+        self.assertEqual(
+            self.client.get(second['previous']).json()['results'],
+            first['results'],
+        )
+
+    def test_post_detail(self):
+        '''Пост отдается вместе с автором и группой'''
+        data = self.client.get(self.POST).json()
+        self.assertEqual(data['id'], self.post.pk)
+        self.assertEqual(data['text'], self.post.text)
+        self.assertEqual(
+            data['author'],
+            {'username': 'author', 'full_name': 'Лев Толстой'},
+        )
+        self.assertEqual(data['group'], {'slug': 'group', 'title': 'Группа'})
+        self.assertIsNone(data['image'])
+        self.assertEqual(data['comment_count'], self.POST_COUNT)
+
+    def test_sparse_fields(self):
+        '''Параметр fields оставляет только запрошенные поля'''
+        data = self.client.get(self.POST, {'fields': 'text,id'}).json()
+        self.assertEqual(data, {'id': self.post.pk, 'text': self.post.text})
+
+        page = self.client.get(self.POSTS, {'fields': 'id'}).json()
+        self.assertEqual(set(page['results'][0]), {'id'})
+        self.assertIn('fields=id', page['next'])
+
+        response = self.client.get(self.POST, {'fields': 'id,password'})
+        self.assertEqual(response.status_code, HTTPStatus.BAD_REQUEST)
+        self.assertIn('password', response.json()['detail'])
+
+    def test_other_resources(self):
+        '''Комментарии, группы и профили'''
+        comments = self.collect(self.client, self.COMMENTS)
+        self.assertEqual(len(comments), self.POST_COUNT)
+        self.assertEqual(comments[0]['author']['username'], 'reader')
+
+        groups = self.collect(self.client, self.GROUPS)
+        self.assertEqual(
+            [group['slug'] for group in groups], [self.group.slug]
+        )
+        self.assertEqual(
+            self.client.get(self.GROUP).json()['description'], 'Описание'
+        )
+
+        profile = self.reader_client.get(self.PROFILE).json()
+        self.assertEqual(profile['posts_count'], self.POST_COUNT)
+        self.assertEqual(profile['followers_count'], 1)
+        self.assertTrue(profile['is_followed'])
+        self.assertFalse(self.client.get(self.PROFILE).json()['is_followed'])
+
+    def test_errors(self):
+        '''Ошибки отдаются в JSON'''
+        cases = (
+            (self.client, self.FOLLOW, HTTPStatus.UNAUTHORIZED),
+            (
+                self.client,
+                reverse('api:v1:post', args=(0,)),
+                HTTPStatus.NOT_FOUND,
+            ),
+            (
+                self.client,
+                reverse('api:v1:comments', args=(0,)),
+                HTTPStatus.NOT_FOUND,
+            ),
+            (
+                self.client,
+                reverse('api:v1:group', args=('missing',)),
+                HTTPStatus.NOT_FOUND,
+            ),
+            (
+                self.client,
+                reverse('api:v1:profile_posts', args=('missing',)),
+                HTTPStatus.NOT_FOUND,
+            ),
+            (self.client, f'{self.POSTS}?after=%%%', HTTPStatus.BAD_REQUEST),
+            (self.client, f'{self.GROUPS}?after=x', HTTPStatus.BAD_REQUEST),
+        )
+        for client, url, status in cases:
+            with self.subTest(url=url):
+                response = client.get(url)
+                self.assertEqual(response.status_code, status)
+                self.assertIn('detail', response.json())
+
+    def test_read_only(self):
+        '''API только для чтения'''
+        response = self.reader_client.post(self.POSTS, {'text': 'Пост'})
+        self.assertEqual(
+            response.status_code, HTTPStatus.METHOD_NOT_ALLOWED
+        )
+
+    def test_query_counts(self):
+        '''Число запросов не зависит от размера страницы'''
+        group_cache.get_by_slug(self.group.slug)
+        timeline.pull_author_ids()
+        cases = (
+            (self.client, self.POSTS, 1),
+            (self.client, self.POST, 1),
+            (self.client, self.COMMENTS, 2),
+            (self.client, self.GROUPS, 1),
+            (self.client, self.GROUP, 0),
+            (self.client, self.GROUP_POSTS, 1),
+            (self.client, self.PROFILE, 1),
+            (self.client, self.PROFILE_POSTS, 2),
+            # Session and user, then the timeline.
+            (self.reader_client, self.FOLLOW, 3),
+        )
+        for client, url, queries in cases:
+            with self.subTest(url=url):
+                with self.assertNumQueries(queries):
+                    client.get(url)
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=0)
+    def test_follow_queries_with_pulled_authors(self):
+        '''Каждый популярный автор читается одним запросом на страницу'''
+        texts = [post.text for post in reversed(self.posts)]
+        for i in range(3):
+            author = User.objects.create_user(username=f'popular_{i}')
+            Follow.objects.create(user=self.reader, author=author)
+            texts.insert(0, Post.objects.create(
+                author=author, text=f'Популярный пост {i}'
+            ).text)
+        cache.clear()
+        timeline.pull_author_ids()
+        pulled = timeline.followed_pull_author_ids(self.reader.pk)
+        self.assertEqual(len(pulled), 4)
+        # Session, user, pulled authors, timeline and one per author.
+        with self.assertNumQueries(4 + len(pulled)):
+            self.reader_client.get(self.FOLLOW)
+        results = self.collect(self.reader_client, self.FOLLOW)
+        self.assertEqual([post['text'] for post in results], texts)
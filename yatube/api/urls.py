@@ -0,0 +1,37 @@
+from django.urls import include, path
+
+from . import views
+
+app_name = 'api'
+
+v1_patterns = [
+    path('posts/', views.PostList.as_view(), name='posts'),
+    path('posts/<int:post_id>/', views.PostDetail.as_view(), name='post'),
+    path(
+        'posts/<int:post_id>/comments/',
+        views.CommentList.as_view(),
+        name='comments'
+    ),
+    path('groups/', views.GroupList.as_view(), name='groups'),
+    path('groups/<slug:slug>/', views.GroupDetail.as_view(), name='group'),
+    path(
+        'groups/<slug:slug>/posts/',
+        views.GroupPostList.as_view(),
+        name='group_posts'
+    ),
+    path(
+        'profiles/<str:username>/',
+        views.ProfileDetail.as_view(),
+        name='profile'
+    ),
+    path(
+        'profiles/<str:username>/posts/',
+        views.ProfilePostList.as_view(),
+        name='profile_posts'
+    ),
+    path('follow/', views.FollowPostList.as_view(), name='follow'),
+]
+
+urlpatterns = [
+    path('v1/', include((v1_patterns, 'v1'))),
+]
@@ -0,0 +1,214 @@
+from http import HTTPStatus
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.core.paginator import InvalidPage
+from django.http import Http404, JsonResponse
+from django.shortcuts import get_object_or_404
+from django.views import View
+from posts import group_cache, timeline
+from posts.models import Comment, Group, Post, User, profiles
+from posts.paginators import CursorPaginator, MergedCursorPaginator
+
+from .exceptions import ApiError
+from .serializers import (
+    CommentSerializer,
+    GroupSerializer,
+    PostSerializer,
+    ProfileSerializer,
+)
+
+
+def error_response(detail, status):
+    return JsonResponse({'detail': detail}, status=status)
+
+
+class ApiView(View):
+    """Read-only JSON endpoint.
+
+    Errors are answered with ``{"detail": ...}`` instead of HTML pages.
+    """
+    http_method_names = ['get', 'head', 'options']
+    serializer_class = None
+    login_required = False
+
+    def dispatch(self, request, *args, **kwargs):
+        try:
+            if self.login_required and not request.user.is_authenticated:
+                raise ApiError(
+                    'Требуется авторизация', HTTPStatus.UNAUTHORIZED
+                )
+            return super().dispatch(request, *args, **kwargs)
+        except ApiError as error:
+            return error_response(error.detail, error.status)
+        except InvalidPage as error:
+            return error_response(str(error), HTTPStatus.BAD_REQUEST)
+        except Http404 as error:
+            return error_response(
+                str(error) or 'Не найдено', HTTPStatus.NOT_FOUND
+            )
+
+    def get_serializer(self):
+        return self.serializer_class(
+            self.request, self.request.GET.get('fields')
+        )
+
+
+class ObjectView(ApiView):
+    def get_object(self):
+        raise ImproperlyConfigured(
+            f'{type(self).__name__} должен определить get_object()'
+        )
+
+    def get(self, request, *args, **kwargs):
+        return JsonResponse(self.get_serializer().serialize(self.get_object()))
+
+
+class CollectionView(ApiView):
+    """A cursor-paginated list: ``?after=``/``?before=`` take the cursors
+    from ``next``/``previous``, no page is ever counted.
+    """
+    paginator_class = CursorPaginator
+    paginator_kwargs = {}
+
+    def get_queryset(self):
+        raise ImproperlyConfigured(
+            f'{type(self).__name__} должен определить get_queryset()'
+        )
+
+    def get_paginator(self, queryset):
+        return self.paginator_class(
+            queryset, settings.API_PAGE_SIZE, **self.paginator_kwargs
+        )
+
+    def page_url(self, kwarg, cursor):
+        if cursor is None:
+            return None
+        params = self.request.GET.copy()
+        params.pop('after', None)
+        params.pop('before', None)
+        params[kwarg] = cursor
+        return self.request.build_absolute_uri(
+            f'{self.request.path}?{params.urlencode()}'
+        )
+
+    def get(self, request, *args, **kwargs):
+        serializer = self.get_serializer()
+        page = self.get_paginator(self.get_queryset()).cursor_page(
+            after=request.GET.get('after'),
+            before=request.GET.get('before'),
+        )
+        return JsonResponse({
+            'results': [serializer.serialize(obj) for obj in page],
+            'next': self.page_url('after', page.next_cursor),
+            'previous': self.page_url('before', page.previous_cursor),
+        })
+
+
+class GroupPaginator(CursorPaginator):
+    # Groups carry no timestamp, the id serves as both keys.
+    keys = ('id', 'id')
+
+    def encode_cursor(self, obj):
+        return str(obj.pk)
+
+    def decode_cursor(self, cursor):
+        try:
+            return int(cursor), int(cursor)
+        except ValueError:
+            raise InvalidPage('Некорректный курсор страницы')
+
+
+def get_group(slug):
+    group = group_cache.get_by_slug(slug)
+    if group is None:
+        raise Http404('Группа не найдена')
+    return group
+
+
+class PostList(CollectionView):
+    serializer_class = PostSerializer
+
+    def get_queryset(self):
+        return Post.objects.for_feed()
+
+
+class PostDetail(ObjectView):
+    serializer_class = PostSerializer
+
+    def get_object(self):
+        return get_object_or_404(
+            Post.objects.for_feed(), pk=self.kwargs['post_id']
+        )
+
+
+class CommentList(CollectionView):
+    serializer_class = CommentSerializer
+
+    def get_queryset(self):
+        post_id = self.kwargs['post_id']
+        if not Post.objects.filter(pk=post_id).exists():
+            raise Http404('Пост не найден')
+        return Comment.objects.for_post(post_id)
+
+
+class GroupList(CollectionView):
+    serializer_class = GroupSerializer
+    paginator_class = GroupPaginator
+
+    def get_queryset(self):
+        return Group.objects.all()
+
+
+class GroupDetail(ObjectView):
+    serializer_class = GroupSerializer
+
+    def get_object(self):
+        return get_group(self.kwargs['slug'])
+
+
+class GroupPostList(PostList):
+    def get_queryset(self):
+        group = get_group(self.kwargs['slug'])
+        return super().get_queryset().filter(group_id=group.pk)
+
+
+class ProfileDetail(ObjectView):
+    serializer_class = ProfileSerializer
+
+    def get_object(self):
+        return get_object_or_404(
+            profiles(self.request.user), username=self.kwargs['username']
+        )
+
+
+class ProfilePostList(PostList):
+    def get_queryset(self):
+        author = get_object_or_404(
+            User.objects.only('pk'), username=self.kwargs['username']
+        )
+        return super().get_queryset().filter(author_id=author.pk)
+
+
+class FollowPostList(PostList):
+    """Posts of the followed authors, merged the way ``FollowIndex``
+    merges them: one query per pulled author besides the timeline, each
+    an index range scan of at most a page.
+    """
+    login_required = True
+    paginator_class = MergedCursorPaginator
+
+    def get_queryset(self):
+        user_id = self.request.user.pk
+        self.pull_author_ids = timeline.followed_pull_author_ids(user_id)
+        return timeline.feed_queryset(user_id, self.pull_author_ids)
+
+    def get_paginator(self, queryset):
+        return self.paginator_class(
+            queryset,
+            settings.API_PAGE_SIZE,
+            keys=('feed_created', 'feed_id'),
+            sources=timeline.feed_sources(
+                self.request.user.pk, self.pull_author_ids
+            ),
+        )
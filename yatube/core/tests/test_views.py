@@ -0,0 +1,123 @@
+import os
+import shutil
+import tempfile
+from http import HTTPStatus
+
+from django.conf import settings
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ServeMediaTest(TestCase):
+    CONTENT = bytes(range(256)) * 4
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        directory = os.path.join(TEMP_MEDIA_ROOT, 'posts')
+        os.makedirs(directory, exist_ok=True)
+        with open(os.path.join(directory, 'file.jpg'), 'wb') as file:
+            file.write(cls.CONTENT)
+        cls.URL = reverse('media', kwargs={'path': 'posts/file.jpg'})
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.client = Client()
+
+    def test_full_file(self):
+        '''Файл отдается целиком с валидаторами'''
+        response = self.client.get(self.URL)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertEqual(b''.join(response.streaming_content), self.CONTENT)
+        self.assertEqual(response['Content-Type'], 'image/jpeg')
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertTrue(response['ETag'].startswith('"'))
+        self.assertIn('Last-Modified', response)
+
+    def test_not_modified(self):
+        '''Повторный запрос с валидатором получает 304'''
+        response = self.client.get(self.URL)
+        validators = {
+            'HTTP_IF_NONE_MATCH': response['ETag'],
+            'HTTP_IF_MODIFIED_SINCE': response['Last-Modified'],
+        }
+        for header, value in validators.items():
+            with self.subTest(header=header):
+                not_modified = self.client.get(self.URL, **{header: value})
+                self.assertEqual(
+                    not_modified.status_code, HTTPStatus.NOT_MODIFIED
+                )
+                self.assertEqual(not_modified['ETag'], response['ETag'])
+
+    def test_ranges(self):
+        '''Диапазоны байтов отдаются с кодом 206'''
+        size = len(self.CONTENT)
+        ranges = {
+            'bytes=0-9': (0, 9),
+            'bytes=1000-': (1000, size - 1),
+            'bytes=-4': (size - 4, size - 1),
+            'bytes=10-100000': (10, size - 1),
+        }
+        for header, (start, end) in ranges.items():
+            with self.subTest(range=header):
+                response = self.client.get(self.URL, HTTP_RANGE=header)
+                self.assertEqual(
+                    response.status_code, HTTPStatus.PARTIAL_CONTENT
+                )
+                self.assertEqual(
+                    response['Content-Range'], f'bytes {start}-{end}/{size}'
+                )
+                self.assertEqual(
+                    b''.join(response.streaming_content),
+                    self.CONTENT[start:end + 1],
+                )
+
+    def test_unsatisfiable_range(self):
+        '''Диапазон за концом файла получает 416'''
+        response = self.client.get(self.URL, HTTP_RANGE='bytes=5000-')
+        self.assertEqual(
+            response.status_code, HTTPStatus.REQUESTED_RANGE_NOT_SATISFIABLE
+        )
+        self.assertEqual(
+            response['Content-Range'], f'bytes */{len(self.CONTENT)}'
+        )
+
+    def test_stale_if_range(self):
+        '''Устаревший If-Range получает весь файл'''
+        response = self.client.get(
+            self.URL, HTTP_RANGE='bytes=0-9', HTTP_IF_RANGE='"old"'
+        )
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+
+    def test_sendfile(self):
+        '''Передача файла отдается фронтенд-серверу'''
+        headers = {
+            'x-accel-redirect': (
+                'X-Accel-Redirect', '/protected-media/posts/file.jpg'
+            ),
+            'x-sendfile': (
+                'X-Sendfile',
+                os.path.join(TEMP_MEDIA_ROOT, 'posts', 'file.jpg'),
+            ),
+        }
+        for mode, (header, value) in headers.items():
+            with self.subTest(mode=mode):
+                with self.settings(MEDIA_SENDFILE=mode):
+                    response = self.client.get(self.URL)
+                self.assertEqual(response[header], value)
+                self.assertEqual(response.content, b'')
+                self.assertIn('ETag', response)
+
+    def test_missing_and_outside_files(self):
+        '''Несуществующие файлы и пути вне MEDIA_ROOT дают 404'''
+        for path in ('posts/missing.jpg', '../manage.py', 'posts'):
+            with self.subTest(path=path):
+                response = self.client.get(f'{settings.MEDIA_URL}{path}')
+                self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
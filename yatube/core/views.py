@@ -1,4 +1,24 @@
+import mimetypes
+import os
+import re
+import stat
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import (
+    FileResponse,
+    Http404,
+    HttpResponse,
+    StreamingHttpResponse,
+)
 from django.shortcuts import render
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, parse_http_date_safe
+from django.views.decorators.http import require_safe
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
 
 
 def page_not_found(request, exception):
@@ -11,3 +31,114 @@ def csrf_failure(request, reason=''):
 
 def server_error(request):
     return render(request, 'core/500.html', status=500)
+
+
+def byte_range(request, etag, mtime, size):
+    """``(start, end)`` of a satisfiable single range, ``None`` for the
+    whole file, ``False`` for an unsatisfiable one.
+    """
+    header = request.META.get('HTTP_RANGE')
+    if not header or size == 0:
+        return None
+    if_range = request.META.get('HTTP_IF_RANGE')
+    if if_range and if_range != etag:
+        if parse_http_date_safe(if_range) != int(mtime):
+            return None
+    match = RANGE_RE.match(header.strip())
+    if not match or match.groups() == ('', ''):
+        # Several ranges are allowed to be answered with the whole file.
+        return None
+    first, last = match.groups()
+    if not first:
+        start, end = max(size - int(last), 0), size - 1
+    else:
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+    if start > end or start >= size:
+        return False
+    return start, end
+
+
+def read_range(file, start, length, chunk_size=64 * 1024):
+    with file:
+        file.seek(start)
+        while length > 0:
+            chunk = file.read(min(chunk_size, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+
+
+def file_response(request, full_path, etag, mtime, size):
+    requested = byte_range(request, etag, mtime, size)
+    if requested is False:
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{size}'
+        return response
+    if request.method == 'HEAD':
+        response = HttpResponse()
+        response['Content-Length'] = size
+    elif requested is None:
+        response = FileResponse(open(full_path, 'rb'))
+    else:
+        start, end = requested
+        response = StreamingHttpResponse(
+            read_range(open(full_path, 'rb'), start, end - start + 1),
+            status=206,
+        )
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+        response['Content-Length'] = end - start + 1
+    response['Accept-Ranges'] = 'bytes'
+    return response
+
+
+@require_safe
+def serve_media(request, path):
+    """Serve a file of ``MEDIA_ROOT`` with validators and ranges.
+
+    With ``MEDIA_SENDFILE`` set the bytes are left to the front server
+    through ``X-Accel-Redirect`` (nginx) or ``X-Sendfile`` (Apache);
+    conditional requests are still answered here.
+    """
+    try:
+        full_path = safe_join(settings.MEDIA_ROOT, path)
+        file_stat = os.stat(full_path)
+    except (SuspiciousFileOperation, OSError):
+        raise Http404('Файл не найден')
+    if not stat.S_ISREG(file_stat.st_mode):
+        raise Http404('Файл не найден')
+
+    size = file_stat.st_size
+    mtime = file_stat.st_mtime
+    etag = f'"{file_stat.st_mtime_ns:x}-{size:x}"'
+    validators = HttpResponse()
+    validators['ETag'] = etag
+    validators['Last-Modified'] = http_date(mtime)
+    validators['Cache-Control'] = f'public, max-age={settings.MEDIA_MAX_AGE}'
+    conditional = get_conditional_response(
+        request, etag=etag, last_modified=int(mtime), response=validators
+    )
+    if conditional is not validators:
+        return conditional
+
+    if settings.MEDIA_SENDFILE == 'x-accel-redirect':
+        response = validators
+        response['X-Accel-Redirect'] = (
+            settings.MEDIA_ACCEL_REDIRECT_PREFIX + quote(path)
+        )
+    elif settings.MEDIA_SENDFILE == 'x-sendfile':
+        response = validators
+        response['X-Sendfile'] = full_path
+    else:
+        response = file_response(request, full_path, etag, mtime, size)
+        if response.status_code == 416:
+            return response
+        for header in ('ETag', 'Last-Modified', 'Cache-Control'):
+            response[header] = validators[header]
+
+    content_type, encoding = mimetypes.guess_type(full_path)
+    response['Content-Type'] = content_type or 'application/octet-stream'
+    if encoding:
+        response['Content-Encoding'] = encoding
+    return response
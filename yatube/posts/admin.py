@@ -1,15 +1,57 @@
+from django.conf import settings
 from django.contrib import admin
+from django.contrib.admin.views.main import PAGE_VAR
+from django.db.models import Q
 
-from .models import Comment, Follow, Group, Post
+from . import search
+from .models import Comment, Follow, Group, Post, User
+from .paginators import LookaheadPaginator
 
 
-class PostAdmin(admin.ModelAdmin):
+class LookaheadPaginationMixin:
+    """Page through a changelist without counting the whole table."""
+    paginator = LookaheadPaginator
+    show_full_result_count = False
+
+    def get_paginator(self, request, queryset, per_page, orphans=0,
+                      allow_empty_first_page=True):
+        try:
+            number = int(request.GET.get(PAGE_VAR, 0)) + 1
+        except ValueError:
+            number = 1
+        return self.paginator(
+            queryset, per_page, orphans, allow_empty_first_page,
+            number=number,
+        )
+
+
+class PostAdmin(LookaheadPaginationMixin, admin.ModelAdmin):
     list_display = ('pk', 'text', 'created', 'author', 'group', 'image',)
-    list_editable = ('text', 'group', 'image')
-    search_fields = ('text',)
+    list_select_related = ('author', 'group')
+    autocomplete_fields = ('author', 'group')
+    search_fields = ('text', '=author__username')
     list_filter = ('created',)
     empty_value_display = '-пусто-'
 
+    def get_search_results(self, request, queryset, search_term):
+        search_term = search_term.strip()
+        if not search_term or not search.is_available():
+            return super().get_search_results(
+                request, queryset, search_term
+            )
+        # Both branches hit an index of posts_post: the primary key for
+        # the full-text matches and the author index for the username.
+        post_ids = search.matching_ids(
+            search_term, settings.SEARCH_MAX_RESULTS
+        )
+        author_ids = User.objects.filter(
+            username=search_term
+        ).values_list('pk', flat=True)
+        queryset = queryset.filter(
+            Q(pk__in=post_ids) | Q(author_id__in=list(author_ids))
+        )
+        return queryset, False
+
 
 class GroupAdmin(admin.ModelAdmin):
     list_display = ('pk', 'title', 'slug', 'description', )
@@ -19,17 +61,21 @@ class GroupAdmin(admin.ModelAdmin):
     empty_value_display = '-пусто-'
 
 
-class CommentAdmin(admin.ModelAdmin):
+class CommentAdmin(LookaheadPaginationMixin, admin.ModelAdmin):
     list_display = ('post', 'author', 'text',)
     list_editable = ('text',)
-    search_fields = ('post', 'author', 'text',)
+    list_select_related = ('post', 'author')
+    autocomplete_fields = ('post', 'author')
+    search_fields = ('=author__username', 'text',)
     list_filter = ('created',)
     empty_value_display = '-пусто-'
 
 
-class FollowAdmin(admin.ModelAdmin):
+class FollowAdmin(LookaheadPaginationMixin, admin.ModelAdmin):
     list_display = ('user', 'author',)
-    search_fields = ('user', 'author',)
+    list_select_related = ('user', 'author')
+    autocomplete_fields = ('user', 'author')
+    search_fields = ('=user__username', '=author__username',)
 
 
 admin.site.register(Post, PostAdmin)
@@ -0,0 +1,221 @@
+import logging
+import threading
+import time
+from bisect import bisect_left, insort
+from itertools import chain
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.urls import reverse
+
+from .models import Group, User
+
+logger = logging.getLogger(__name__)
+
+USER = 'user'
+GROUP = 'group'
+
+_lock = threading.Lock()
+_index = None
+_expires = 0
+_refreshing = False
+# One list per running build: changes made meanwhile, replayed onto it.
+_change_logs = []
+
+
+def normalize(text):
+    return ' '.join(text.casefold().split())
+
+
+def terms_of(label):
+    """Every word of ``label`` starts a term, so "Лев Толстой" is found
+    by both "лев" and "толст".
+    """
+    words = normalize(label).split(' ')
+    return {' '.join(words[i:]) for i in range(len(words)) if words[i]}
+
+
+def terms_of_labels(labels):
+    terms = set()
+    for label in labels:
+        terms.update(terms_of(label))
+    return terms
+
+
+class PrefixIndex:
+    """Sorted list of ``(term, kind, pk)`` searched with bisect.
+
+    ``items`` keeps the terms and the JSON payload of every object, so
+    an object can be replaced or removed without a scan. The initial
+    ``entries`` are sorted once, later ones inserted in place.
+    """
+
+    def __init__(self, entries=()):
+        self.terms = []
+        self.items = {}
+        for kind, pk, labels, payload in entries:
+            terms = terms_of_labels(labels)
+            self.items[kind, pk] = (terms, payload)
+            self.terms.extend((term, kind, pk) for term in terms)
+        self.terms.sort()
+
+    def add(self, kind, pk, labels, payload):
+        self.remove(kind, pk)
+        terms = terms_of_labels(labels)
+        for term in terms:
+            insort(self.terms, (term, kind, pk))
+        self.items[kind, pk] = (terms, payload)
+
+    def remove(self, kind, pk):
+        entry = self.items.pop((kind, pk), None)
+        if entry is None:
+            return
+        for term in entry[0]:
+            position = bisect_left(self.terms, (term, kind, pk))
+            del self.terms[position]
+
+    def search(self, prefix, limit):
+        prefix = normalize(prefix)
+        results = []
+        seen = set()
+        position = bisect_left(self.terms, (prefix,))
+        while position < len(self.terms) and len(results) < limit:
+            term, kind, pk = self.terms[position]
+            if not term.startswith(prefix):
+                break
+            position += 1
+            if (kind, pk) not in seen:
+                seen.add((kind, pk))
+                results.append((kind, self.items[kind, pk][1]))
+        return results
+
+
+def user_entry(pk, username, first_name, last_name):
+    full_name = f'{first_name} {last_name}'.strip()
+    return (
+        USER,
+        pk,
+        (username, full_name),
+        {'username': username, 'full_name': full_name},
+    )
+
+
+def group_entry(pk, title, slug):
+    return GROUP, pk, (title,), {'title': title, 'slug': slug}
+
+
+def build():
+    users = User.objects.values_list(
+        'pk', 'username', 'first_name', 'last_name'
+    )
+    groups = Group.objects.values_list('pk', 'title', 'slug')
+    return PrefixIndex(chain(
+        (user_entry(*row) for row in users.iterator()),
+        (group_entry(*row) for row in groups.iterator()),
+    ))
+
+
+def apply(index, kind, pk, entry):
+    index.remove(kind, pk)
+    if entry is not None:
+        index.add(*entry)
+
+
+def refresh():
+    """Build a new index outside the lock and swap it in."""
+    global _index, _expires
+    changes = []
+    with _lock:
+        _change_logs.append(changes)
+    try:
+        index = build()
+    finally:
+        with _lock:
+            _change_logs.remove(changes)
+    with _lock:
+        for change in changes:
+            apply(index, *change)
+        _index = index
+        _expires = time.monotonic() + settings.AUTOCOMPLETE_TIMEOUT
+        return index
+
+
+def _refresh_in_background():
+    global _refreshing
+    try:
+        refresh()
+    except Exception:
+        logger.exception('Не удалось перестроить индекс автодополнения')
+    finally:
+        with _lock:
+            _refreshing = False
+        close_old_connections()
+
+
+def get_index():
+    """The index of this process.
+
+    Changes made here are applied right away by the signal handlers;
+    changes made by other processes arrive with the rebuild every
+    ``AUTOCOMPLETE_TIMEOUT``, which runs in a background thread while
+    the stale index keeps answering.
+    """
+    global _refreshing
+    with _lock:
+        if _index is not None:
+            if _expires < time.monotonic() and not _refreshing:
+                _refreshing = True
+                threading.Thread(
+                    target=_refresh_in_background,
+                    name='autocomplete',
+                    daemon=True,
+                ).start()
+            return _index
+    return refresh()
+
+
+def suggest(query, limit):
+    index = get_index()
+    with _lock:
+        found = index.search(query, limit)
+    results = []
+    for kind, payload in found:
+        if kind == USER:
+            url = reverse('posts:profile', args=(payload['username'],))
+        else:
+            url = reverse('posts:group_list', args=(payload['slug'],))
+        results.append({'type': kind, **payload, 'url': url})
+    return results
+
+
+def _update(kind, pk, entry=None):
+    with _lock:
+        for changes in _change_logs:
+            changes.append((kind, pk, entry))
+        if _index is not None:
+            apply(_index, kind, pk, entry)
+
+
+def update_user(user):
+    _update(USER, user.pk, user_entry(
+        user.pk, user.username, user.first_name, user.last_name
+    ))
+
+
+def remove_user(user):
+    _update(USER, user.pk)
+
+
+def update_group(group):
+    _update(GROUP, group.pk, group_entry(group.pk, group.title, group.slug))
+
+
+def remove_group(group):
+    _update(GROUP, group.pk)
+
+
+def clear():
+    global _index, _refreshing
+    with _lock:
+        _index = None
+        _refreshing = False
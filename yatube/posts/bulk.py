@@ -0,0 +1,31 @@
+from contextlib import contextmanager
+
+from django.db import connections, router
+from django.db.models import AutoField
+
+
+def batch_size(model, size):
+    """``size`` capped to what one INSERT of ``model`` may hold.
+
+    Django 2.2 uses an explicit ``bulk_create`` batch size as is, while
+    SQLite refuses an INSERT of more than 500 rows.
+    """
+    connection = connections[router.db_for_write(model)]
+    fields = [
+        field for field in model._meta.concrete_fields
+        if not isinstance(field, AutoField)
+    ]
+    return min(size, connection.ops.bulk_batch_size(fields, range(size)))
+
+
+@contextmanager
+def explicit_created(*models):
+    """Let ``bulk_create`` keep the ``created`` values set on the rows."""
+    fields = [model._meta.get_field('created') for model in models]
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field in fields:
+            field.auto_now_add = True
@@ -0,0 +1,101 @@
+import time
+
+from django.core.cache import cache
+
+GENERATION_KEY = 'feed_cache:generation'
+SITE_GENERATION_KEY = 'feed_cache:site'
+
+
+def scoped_key(scope, pk):
+    return f'{GENERATION_KEY}:{scope}:{pk}'
+
+
+def user_generation_key(username):
+    return scoped_key('user', username)
+
+
+def generation(key=GENERATION_KEY):
+    value = cache.get(key)
+    if value is None:
+        # Start from the clock, not from 1: after an eviction the counter
+        # must not come back to a value some stale fragment was keyed on.
+        cache.add(key, time.time_ns(), None)
+        value = cache.get(key)
+    return value
+
+
+def bump_generation(key=GENERATION_KEY):
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, time.time_ns(), None)
+
+
+def user_generation(username):
+    """Generation of what depends on the posts and follows of the user.
+
+    Keyed on the username, which is all a profile URL carries.
+    """
+    return generation(user_generation_key(username))
+
+
+def bump_user_generation(username):
+    bump_generation(user_generation_key(username))
+
+
+def site_generation():
+    """Generation of what every page shows: author names, group titles."""
+    return generation(SITE_GENERATION_KEY)
+
+
+def bump_site_generation():
+    bump_generation(SITE_GENERATION_KEY)
+    bump_generation()
+
+
+def group_generation(group_id):
+    return generation(scoped_key('group', group_id))
+
+
+def post_generation(post_id):
+    return generation(scoped_key('post', post_id))
+
+
+def author_posts_generations(author_ids):
+    """Generations of the posts of ``author_ids``, in one cache read."""
+    if not author_ids:
+        return None
+    keys = [scoped_key('author', pk) for pk in sorted(author_ids)]
+    generations = cache.get_many(keys)
+    return tuple(generations.get(key) for key in keys)
+
+
+def bump_author_posts(author_id):
+    bump_generation(scoped_key('author', author_id))
+
+
+def bump_post(post, group_ids=()):
+    """Bump the pages ``post`` is shown on.
+
+    Those are the common feeds, the post itself, its author's profile
+    and its group, plus ``group_ids`` it has just been moved out of.
+    """
+    bump_pages(post.pk, post.author.username, {post.group_id, *group_ids})
+
+
+def bump_pages(post_id, username, group_ids=()):
+    """``bump_post()`` for a post known by its id, author and groups."""
+    bump_generation()
+    bump_generation(scoped_key('post', post_id))
+    bump_user_generation(username)
+    for group_id in set(group_ids) - {None}:
+        bump_generation(scoped_key('group', group_id))
+
+
+def page_key(feed, params, page_kwarg='page'):
+    page = ':'.join(
+        f'{name}={params[name]}'
+        for name in (page_kwarg, 'after', 'before')
+        if name in params
+    )
+    return f'{feed}:{generation()}:{page}'
@@ -0,0 +1,260 @@
+import hashlib
+import io
+import json
+from itertools import chain
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import Http404, HttpResponse, StreamingHttpResponse
+from django.shortcuts import get_object_or_404
+from django.urls import reverse
+from django.utils import feedgenerator
+from django.utils.html import linebreaks
+from django.utils.text import Truncator
+from django.utils.xmlutils import SimplerXMLGenerator
+from django.views import View
+
+from . import feed_cache, group_cache
+from .mixins import ConditionalGetMixin
+from .models import Post, User
+
+TITLE_WORDS = 10
+
+
+class StreamingFeedMixin:
+    """Write a ``feedgenerator`` feed one item at a time.
+
+    The document is rendered once without items and split where they
+    go, then every item is rendered on its own. The first item is read
+    ahead, it dates the whole feed.
+    """
+    item_element = None
+    closing_tag = None
+    latest_date = None
+
+    def latest_post_date(self):
+        return self.latest_date or super().latest_post_date()
+
+    def render_item(self, item):
+        # Descriptions are HTML in RSS and Atom, posts are plain text.
+        self.add_item(**{
+            **item,
+            'description': linebreaks(item['description'], autoescape=True),
+        })
+        item = self.items.pop()
+        out = io.StringIO()
+        handler = SimplerXMLGenerator(out, 'utf-8')
+        handler.startElement(self.item_element, self.item_attributes(item))
+        self.add_item_elements(handler, item)
+        handler.endElement(self.item_element)
+        return out.getvalue()
+
+    def chunks(self, items):
+        items = iter(items)
+        first = next(items, None)
+        if first is not None:
+            self.latest_date = first['pubdate']
+            items = chain([first], items)
+        out = io.StringIO()
+        self.write(out, 'utf-8')
+        document = out.getvalue()
+        split = document.rindex(self.closing_tag)
+        yield document[:split]
+        for item in items:
+            yield self.render_item(item)
+        yield document[split:]
+
+
+class RSSFeed(StreamingFeedMixin, feedgenerator.Rss201rev2Feed):
+    item_element = 'item'
+    closing_tag = '</channel>'
+
+
+class AtomFeed(StreamingFeedMixin, feedgenerator.Atom1Feed):
+    item_element = 'entry'
+    closing_tag = '</feed>'
+
+
+class JSONFeed:
+    """JSON Feed 1.1 with the interface of the feeds above."""
+    content_type = 'application/feed+json; charset=utf-8'
+    version = 'https://jsonfeed.org/version/1.1'
+
+    def __init__(self, title, link, description, feed_url, language=None):
+        self.feed = {
+            'version': self.version,
+            'title': title,
+            'home_page_url': link,
+            'feed_url': feed_url,
+            'description': description,
+            'language': language,
+        }
+
+    @staticmethod
+    def dumps(data):
+        return json.dumps(data, ensure_ascii=False)
+
+    def render_item(self, item):
+        data = {
+            'id': item['unique_id'],
+            'url': item['link'],
+            'title': item['title'],
+            'content_text': item['description'],
+            'date_published': item['pubdate'].isoformat(),
+            'authors': [
+                {'name': item['author_name'], 'url': item['author_link']},
+            ],
+        }
+        if item['categories']:
+            data['tags'] = list(item['categories'])
+        return self.dumps(data)
+
+    def chunks(self, items):
+        yield self.dumps(self.feed)[:-1] + ', "items": ['
+        for number, item in enumerate(items):
+            yield (',' if number else '') + self.render_item(item)
+        yield ']}'
+
+
+class PostFeed(ConditionalGetMixin, View):
+    """Latest posts as RSS, Atom or JSON Feed.
+
+    A feed is the same for every reader, so the ETag and the cached
+    document only depend on the URL and the generations the view
+    reads in ``get_etag_parts()``. On a miss
+    the document is streamed from an iterator over the posts and cached
+    once the last chunk is sent.
+    """
+    formats = {'rss': RSSFeed, 'atom': AtomFeed, 'json': JSONFeed}
+    title = 'Yatube'
+    description = 'Последние обновления на сайте'
+
+    def get_viewer_parts(self, request):
+        return []
+
+    def get_etag_parts(self):
+        return [*super().get_etag_parts(), *self.get_feed_parts()]
+
+    def get_feed_parts(self):
+        return [feed_cache.generation()]
+
+    def get_object(self):
+        return None
+
+    def get_queryset(self):
+        return Post.objects.for_feed()
+
+    def get_link(self):
+        return reverse('posts:index')
+
+    def get_title(self):
+        return self.title
+
+    def get_description(self):
+        return self.description
+
+    def get_cache_key(self):
+        parts = [
+            self.request.build_absolute_uri(self.request.path),
+            *self.get_etag_parts(),
+        ]
+        digest = hashlib.md5(':'.join(map(str, parts)).encode()).hexdigest()
+        return f'syndication:{digest}'
+
+    def get_item(self, post):
+        link = self.request.build_absolute_uri(
+            reverse('posts:post_detail', args=(post.pk,))
+        )
+        author = post.author
+        return {
+            'title': Truncator(post.text).words(TITLE_WORDS),
+            'link': link,
+            'unique_id': link,
+            'description': post.text,
+            'pubdate': post.created,
+            'author_name': author.get_full_name() or author.username,
+            'author_link': self.request.build_absolute_uri(
+                reverse('posts:profile', args=(author.username,))
+            ),
+            'categories': (post.group.title,) if post.group else (),
+        }
+
+    def stream(self, key, chunks):
+        parts = []
+        for chunk in chunks:
+            parts.append(chunk)
+            yield chunk
+        cache.set(key, ''.join(parts), settings.FEED_CACHE_TIMEOUT)
+
+    def get(self, request, *args, feed_format, **kwargs):
+        feed_class = self.formats.get(feed_format)
+        if feed_class is None:
+            raise Http404('Неизвестный формат ленты')
+        key = self.get_cache_key()
+        document = cache.get(key)
+        if document is not None:
+            return HttpResponse(document, content_type=feed_class.content_type)
+
+        self.object = self.get_object()
+        feed = feed_class(
+            title=self.get_title(),
+            link=request.build_absolute_uri(self.get_link()),
+            description=self.get_description(),
+            feed_url=request.build_absolute_uri(request.path),
+            language=settings.LANGUAGE_CODE,
+        )
+        posts = self.get_queryset()[:settings.SYNDICATION_ITEMS]
+        chunks = feed.chunks(self.get_item(post) for post in posts.iterator())
+        return StreamingHttpResponse(
+            self.stream(key, chunks), content_type=feed_class.content_type
+        )
+
+
+class GroupFeed(PostFeed):
+    def get_feed_parts(self):
+        group = group_cache.get_by_slug(self.kwargs['slug'])
+        if group is None:
+            return []
+        return [feed_cache.group_generation(group.pk)]
+
+    def get_object(self):
+        group = group_cache.get_by_slug(self.kwargs['slug'])
+        if group is None:
+            raise Http404('Группа не найдена')
+        return group
+
+    def get_queryset(self):
+        return super().get_queryset().filter(group_id=self.object.pk)
+
+    def get_link(self):
+        return reverse('posts:group_list', args=(self.object.slug,))
+
+    def get_title(self):
+        return f'{self.title}: {self.object.title}'
+
+    def get_description(self):
+        return self.object.description
+
+
+class ProfileFeed(PostFeed):
+    def get_feed_parts(self):
+        return [feed_cache.user_generation(self.kwargs['username'])]
+
+    def get_object(self):
+        return get_object_or_404(
+            User.objects.only('username', 'first_name', 'last_name'),
+            username=self.kwargs['username'],
+        )
+
+    def get_queryset(self):
+        return super().get_queryset().filter(author_id=self.object.pk)
+
+    def get_link(self):
+        return reverse('posts:profile', args=(self.object.username,))
+
+    def get_title(self):
+        author = self.object
+        return f'{self.title}: {author.get_full_name() or author.username}'
+
+    def get_description(self):
+        return f'Записи пользователя {self.object.username}'
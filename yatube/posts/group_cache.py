@@ -0,0 +1,47 @@
+import threading
+import time
+
+from django.conf import settings
+
+from .models import Group
+
+_lock = threading.Lock()
+_by_slug = {}
+_by_id = {}
+
+
+def _get(index, key, **lookup):
+    entry = index.get(key)
+    if entry is not None and entry[1] > time.monotonic():
+        return entry[0]
+    try:
+        group = Group.objects.get(**lookup)
+    except Group.DoesNotExist:
+        return None
+    # Other processes only learn about changes when the entry expires.
+    expires = time.monotonic() + settings.GROUP_CACHE_TIMEOUT
+    with _lock:
+        _by_slug[group.slug] = _by_id[group.pk] = (group, expires)
+    return group
+
+
+def get_by_slug(slug):
+    return _get(_by_slug, slug, slug=slug)
+
+
+def get_by_id(pk):
+    return _get(_by_id, pk, pk=pk)
+
+
+def forget(group):
+    with _lock:
+        _by_id.pop(group.pk, None)
+        for slug, (cached, _) in list(_by_slug.items()):
+            if cached.pk == group.pk:
+                del _by_slug[slug]
+
+
+def clear():
+    with _lock:
+        _by_slug.clear()
+        _by_id.clear()
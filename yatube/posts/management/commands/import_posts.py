@@ -0,0 +1,248 @@
+import csv
+import json
+import os
+import sys
+import time
+from collections import Counter
+from contextlib import contextmanager
+from itertools import islice
+
+from django.core.cache import cache
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.files import File
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+from django.utils._os import safe_join
+from django.utils.dateparse import parse_datetime
+
+from posts import feed_cache, stats, timeline
+from posts.bulk import explicit_created
+from posts.models import Group, Post, User
+from posts.paginators import feed_count_key
+
+FORMATS = ('jsonl', 'csv')
+
+
+class InvalidRow(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        'Импортирует посты из JSONL или CSV с полями '
+        'author, group, text, image, created'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path',
+            help='Файл с постами, "-" для стандартного ввода',
+        )
+        parser.add_argument(
+            '--format',
+            dest='file_format',
+            choices=FORMATS,
+            help='Формат файла, по умолчанию по расширению',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Количество постов в одной транзакции',
+        )
+        parser.add_argument(
+            '--images',
+            dest='images_dir',
+            help=(
+                'Каталог с картинками постов, они сохраняются в хранилище. '
+                'Без него image - имя уже загруженного файла'
+            ),
+        )
+
+    def handle(self, *args, path, file_format, batch_size, images_dir,
+               **options):
+        if file_format is None:
+            file_format = path.rsplit('.', 1)[-1].lower()
+            if file_format not in FORMATS:
+                raise CommandError('Укажите формат файла в --format')
+        self.verbosity = options['verbosity']
+        self.images_dir = images_dir
+        self.image_field = Post._meta.get_field('image')
+        self.authors = {}
+        self.groups = {}
+        self.touched_authors = set()
+        self.touched_groups = set()
+        self.imported = self.skipped = 0
+
+        started = time.monotonic()
+        try:
+            with self.open(path) as file:
+                rows = enumerate(self.read(file, file_format), 1)
+                while True:
+                    chunk = list(islice(rows, batch_size))
+                    if not chunk:
+                        break
+                    self.import_chunk(chunk)
+                    if self.verbosity > 1:
+                        self.report(started)
+        finally:
+            self.refresh()
+        self.report(started)
+
+    @contextmanager
+    def open(self, path):
+        if path == '-':
+            yield sys.stdin
+            return
+        try:
+            file = open(path, encoding='utf-8', newline='')
+        except OSError as error:
+            raise CommandError(f'Не удалось открыть {path}: {error}')
+        with file:
+            yield file
+
+    @staticmethod
+    def read(file, file_format):
+        if file_format == 'csv':
+            yield from csv.DictReader(file)
+            return
+        for line in file:
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError:
+                row = None
+            yield row if isinstance(row, dict) else None
+
+    def resolve(self, chunk):
+        """Look up the authors and groups of ``chunk`` not seen before,
+        one query for each.
+        """
+        usernames = set()
+        slugs = set()
+        for _, row in chunk:
+            if row is not None:
+                usernames.add(row.get('author'))
+                slugs.add(row.get('group') or None)
+        usernames.difference_update(self.authors)
+        slugs.difference_update(self.groups)
+        slugs.discard(None)
+        self.authors.update(dict.fromkeys(usernames))
+        self.authors.update(
+            User.objects.filter(username__in=usernames)
+            .values_list('username', 'pk')
+        )
+        self.groups.update(dict.fromkeys(slugs))
+        self.groups.update(
+            Group.objects.filter(slug__in=slugs).values_list('slug', 'pk')
+        )
+
+    def build(self, row):
+        if row is None:
+            raise InvalidRow('некорректная строка')
+        author_id = self.authors.get(row.get('author'))
+        if author_id is None:
+            raise InvalidRow(f'нет пользователя {row.get("author")!r}')
+        slug = row.get('group') or None
+        group_id = self.groups.get(slug)
+        if slug is not None and group_id is None:
+            raise InvalidRow(f'нет группы {slug!r}')
+        text = (row.get('text') or '').strip()
+        if not text:
+            raise InvalidRow('пустой текст')
+        return Post(
+            author_id=author_id,
+            group_id=group_id,
+            text=text,
+            created=self.created(row.get('created')),
+            image=self.image(row.get('image')),
+        )
+
+    @staticmethod
+    def created(value):
+        if not value:
+            return timezone.now()
+        try:
+            created = parse_datetime(value)
+        except (TypeError, ValueError):
+            created = None
+        if created is None:
+            raise InvalidRow(f'некорректная дата {value!r}')
+        if timezone.is_naive(created):
+            created = timezone.make_aware(created)
+        return created
+
+    def image(self, name):
+        """Stored name of the image ``name``.
+
+        With ``--images`` the file is read from that directory and saved
+        through the storage of ``Post.image``; otherwise it must already
+        be in the storage. Names escaping either directory are rejected.
+        """
+        if not name:
+            return ''
+        try:
+            if self.images_dir is not None:
+                with open(safe_join(self.images_dir, name), 'rb') as file:
+                    return self.image_field.storage.save(
+                        self.image_field.generate_filename(
+                            None, os.path.basename(name)
+                        ),
+                        File(file),
+                    )
+            storage = self.image_field.storage
+            if not os.path.isabs(name) and storage.exists(name):
+                return name
+        except (OSError, SuspiciousFileOperation):
+            pass
+        raise InvalidRow(f'нет картинки {name!r}')
+
+    def import_chunk(self, chunk):
+        self.resolve(chunk)
+        posts = []
+        for number, row in chunk:
+            try:
+                posts.append(self.build(row))
+            except InvalidRow as error:
+                self.skipped += 1
+                self.stderr.write(f'Строка {number} пропущена: {error}')
+        # bulk_create sends no signals: the author counters are adjusted
+        # here, timelines and caches are refreshed once at the end.
+        authors = Counter(post.author_id for post in posts)
+        with transaction.atomic(), explicit_created(Post):
+            Post.objects.bulk_create(posts)
+            for author_id, count in authors.items():
+                stats.adjust_user(author_id, 'posts_count', count)
+        self.imported += len(posts)
+        self.touched_authors.update(authors)
+        self.touched_groups.update(
+            post.group_id for post in posts if post.group_id is not None
+        )
+
+    def refresh(self):
+        keys = [feed_count_key('index')]
+        for author_id in self.touched_authors:
+            keys.append(feed_count_key('author', author_id))
+            # Counted at read time by the followers of pulled authors.
+            feed_cache.bump_author_posts(author_id)
+            keys.extend(
+                feed_count_key('follow', user_id)
+                for user_id in timeline.backfill_followers(author_id)
+            )
+        keys.extend(
+            feed_count_key('group', group_id)
+            for group_id in self.touched_groups
+        )
+        cache.delete_many(keys)
+        # Rows bypass the signals, so every page has to be rendered again.
+        feed_cache.bump_site_generation()
+
+    def report(self, started):
+        rows = self.imported + self.skipped
+        rate = rows / max(time.monotonic() - started, 1e-6)
+        self.stdout.write(
+            f'Импортировано постов: {self.imported}, '
+            f'пропущено строк: {self.skipped}, {rate:.0f} строк/с'
+        )
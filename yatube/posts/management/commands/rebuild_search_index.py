@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import search
+
+
+class Command(BaseCommand):
+    help = 'Перестраивает полнотекстовый индекс постов'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--optimize',
+            action='store_true',
+            help='Слить сегменты индекса после перестроения',
+        )
+
+    def handle(self, *args, optimize, **options):
+        if not search.is_available():
+            raise CommandError('Полнотекстовый индекс есть только в SQLite')
+        recreated = search.ensure_schema()
+        if recreated:
+            self.stdout.write(f'Восстановлено: {", ".join(recreated)}')
+        search.rebuild()
+        if optimize:
+            search.optimize()
+        self.stdout.write('Индекс поиска перестроен')
@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand
+
+from posts import stats
+from posts.models import Post, UserStats
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает счетчики постов, комментариев и подписок'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=10000,
+            help='Количество строк в одном UPDATE',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Только посчитать расхождения',
+        )
+
+    def handle(self, *args, batch_size, dry_run, **options):
+        if not dry_run:
+            stats.create_missing_stats(batch_size)
+        targets = (
+            ('пользователей', UserStats.objects.all(), stats.user_counts()),
+            ('постов', Post.objects.all(), stats.post_counts()),
+        )
+        for name, queryset, counts in targets:
+            if dry_run:
+                drift = stats.drifted(queryset, counts).count()
+            else:
+                drift = stats.recount(queryset, counts, batch_size)
+            self.stdout.write(f'Расхождений у {name}: {drift}')
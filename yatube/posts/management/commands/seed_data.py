@@ -0,0 +1,297 @@
+import io
+import random
+import time
+from contextlib import contextmanager
+from datetime import timedelta
+from itertools import accumulate, islice
+
+from django.contrib.auth.hashers import make_password
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+from faker import Faker
+from PIL import Image, ImageDraw
+
+from posts import timeline
+from posts.bulk import explicit_created
+from posts.models import Comment, Follow, Group, Post, User
+
+# Shape of the skews: authors, groups and commented posts are picked
+# with Zipf weights, per-user follows and per-post comments are drawn
+# from a Pareto distribution.
+ZIPF_EXPONENT = 1.1
+PARETO_ALPHA = 1.5
+SENTENCES = 2000
+
+
+def zipf_weights(size):
+    return list(accumulate(
+        1 / rank ** ZIPF_EXPONENT for rank in range(1, size + 1)
+    ))
+
+
+def chunks(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+class Command(BaseCommand):
+    help = (
+        'Заполняет базу правдоподобными данными для нагрузочных тестов. '
+        'Один и тот же --seed дает один и тот же набор'
+    )
+
+    def add_arguments(self, parser):
+        counts = (
+            ('--users', 1000, 'Количество пользователей'),
+            ('--groups', 50, 'Количество групп'),
+            ('--posts', 100000, 'Количество постов'),
+            ('--follows', 20000, 'Примерное количество подписок'),
+            ('--comments', 300000, 'Примерное количество комментариев'),
+            ('--images', 20, 'Количество разных картинок'),
+            ('--days', 365, 'За сколько дней распределить посты'),
+            ('--seed', 1, 'Зерно генератора случайных чисел'),
+            ('--batch-size', 5000, 'Количество строк в одном INSERT'),
+        )
+        for name, default, help_text in counts:
+            parser.add_argument(
+                name, type=int, default=default, help=help_text
+            )
+        parser.add_argument(
+            '--image-share',
+            type=float,
+            default=0.1,
+            help='Доля постов с картинкой',
+        )
+
+    def handle(self, *args, **options):
+        if options['users'] < 1:
+            raise CommandError('Нужен хотя бы один пользователь')
+        self.options = options
+        self.batch_size = options['batch_size']
+        self.random = random.Random(options['seed'])
+        self.fake = Faker('ru_RU')
+        self.fake.seed_instance(options['seed'])
+        self.sentences = [
+            self.fake.sentence() for _ in range(SENTENCES)
+        ]
+        self.now = timezone.now()
+
+        with explicit_created(Post, Comment):
+            users = self.create_users()
+            if not users:
+                raise CommandError('Ни один пользователь не добавлен')
+            groups = self.create_groups()
+            images = self.create_images()
+            first_post = self.create_posts(users, groups, images)
+            self.create_follows(users)
+            self.create_comments(users, first_post)
+
+        # Nothing above sent signals: counters, caches and timelines are
+        # rebuilt from the inserted rows.
+        call_command('recount_stats', stdout=self.stdout)
+        cache.clear()
+        self.rebuild_timelines(users)
+
+    @contextmanager
+    def stage(self, name):
+        started = time.monotonic()
+        counter = [0]
+        yield counter
+        elapsed = max(time.monotonic() - started, 1e-6)
+        self.stdout.write(
+            f'{name}: {counter[0]}, {counter[0] / elapsed:.0f} строк/с'
+        )
+
+    def insert(self, model, objects, counter):
+        for chunk in chunks(objects, self.batch_size):
+            with transaction.atomic():
+                model.objects.bulk_create(chunk, ignore_conflicts=True)
+            counter[0] += len(chunk)
+
+    def text(self, low, high):
+        size = self.random.randint(low, high)
+        return ' '.join(self.random.choices(self.sentences, k=size))
+
+    def skewed_count(self, mean, limit):
+        """A Pareto-distributed count with the given mean."""
+        value = self.random.paretovariate(PARETO_ALPHA) - 1
+        return min(round(mean * (PARETO_ALPHA - 1) * value), limit)
+
+    def popular(self, ids):
+        """``ids`` shuffled, so popularity does not follow the ids,
+        with their Zipf weights.
+        """
+        ids = list(ids)
+        self.random.shuffle(ids)
+        return ids, zipf_weights(len(ids))
+
+    def created_after(self, start, days):
+        span = (self.now - start).total_seconds()
+        seconds = self.random.uniform(0, min(span, days * 86400))
+        return start + timedelta(seconds=seconds)
+
+    def create_users(self):
+        last_pk = User.objects.order_by('-pk').values_list('pk', flat=True)
+        last_pk = last_pk.first() or 0
+        password = make_password(None)
+        # Numbering after the last pk keeps the names of a repeated run
+        # from clashing with the previous one.
+        users = (
+            User(
+                username=f'{self.fake.user_name()}_{last_pk + number}',
+                first_name=self.fake.first_name(),
+                last_name=self.fake.last_name(),
+                password=password,
+                date_joined=self.now,
+            )
+            for number in range(self.options['users'])
+        )
+        with self.stage('Пользователей') as counter:
+            self.insert(User, users, counter)
+        return list(
+            User.objects.filter(pk__gt=last_pk).values_list('pk', flat=True)
+        )
+
+    def create_groups(self):
+        last_pk = Group.objects.order_by('-pk').values_list('pk', flat=True)
+        last_pk = last_pk.first() or 0
+        groups = []
+        for number in range(self.options['groups']):
+            title = ' '.join(self.fake.words(2)).capitalize()
+            groups.append(Group(
+                title=title,
+                slug=f'group-{last_pk + number}',
+                description=self.text(1, 3),
+            ))
+        with self.stage('Групп') as counter:
+            self.insert(Group, groups, counter)
+        return list(
+            Group.objects.filter(pk__gt=last_pk).values_list('pk', flat=True)
+        )
+
+    def create_images(self):
+        storage = Post._meta.get_field('image').storage
+        names = []
+        for number in range(self.options['images']):
+            image = Image.new('RGB', (1200, 800), self.color())
+            draw = ImageDraw.Draw(image)
+            for _ in range(12):
+                x, y = self.random.randrange(1200), self.random.randrange(800)
+                radius = self.random.randrange(40, 300)
+                draw.ellipse(
+                    (x - radius, y - radius, x + radius, y + radius),
+                    fill=self.color(),
+                )
+            content = io.BytesIO()
+            image.save(content, 'JPEG', quality=85)
+            names.append(storage.save(
+                f'posts/seed_{number}.jpg', ContentFile(content.getvalue())
+            ))
+        return names
+
+    def color(self):
+        return tuple(self.random.randrange(256) for _ in range(3))
+
+    def create_posts(self, users, groups, images):
+        """Insert the posts, return the id of the first one."""
+        last_pk = Post.objects.order_by('-pk').values_list('pk', flat=True)
+        last_pk = last_pk.first() or 0
+        authors, author_weights = self.popular(users)
+        groups, group_weights = self.popular(groups)
+        image_share = self.options['image_share'] if images else 0
+        start = self.now - timedelta(days=self.options['days'])
+
+        def posts():
+            for _ in range(self.options['posts']):
+                group = None
+                if groups and self.random.random() < 0.7:
+                    group = self.random.choices(
+                        groups, cum_weights=group_weights
+                    )[0]
+                image = ''
+                if self.random.random() < image_share:
+                    image = self.random.choice(images)
+                yield Post(
+                    author_id=self.random.choices(
+                        authors, cum_weights=author_weights
+                    )[0],
+                    group_id=group,
+                    text=self.text(1, 8),
+                    image=image,
+                    created=self.created_after(start, self.options['days']),
+                )
+
+        with self.stage('Постов') as counter:
+            self.insert(Post, posts(), counter)
+        return last_pk + 1
+
+    def create_follows(self, users):
+        authors, weights = self.popular(users)
+        limit = max(len(users) - 1, 0)
+        mean = self.options['follows'] / max(len(users), 1)
+
+        def follows():
+            for user_id in users:
+                degree = self.skewed_count(mean, limit)
+                chosen = set(self.random.choices(
+                    authors, cum_weights=weights, k=degree
+                ))
+                chosen.discard(user_id)
+                for author_id in sorted(chosen):
+                    yield Follow(user_id=user_id, author_id=author_id)
+
+        with self.stage('Подписок') as counter:
+            self.insert(Follow, follows(), counter)
+
+    def seeded_posts(self, first_post):
+        """``(id, created)`` of the new posts, a page at a time."""
+        last_pk = first_post - 1
+        while True:
+            page = list(
+                Post.objects.filter(pk__gt=last_pk)
+                .order_by('pk')
+                .values_list('pk', 'created')[:self.batch_size]
+            )
+            if not page:
+                return
+            yield from page
+            last_pk = page[-1][0]
+
+    def create_comments(self, users, first_post):
+        authors, weights = self.popular(users)
+        mean = self.options['comments'] / max(self.options['posts'], 1)
+
+        def comments():
+            for post_id, created in self.seeded_posts(first_post):
+                count = self.skewed_count(mean, self.options['comments'])
+                for _ in range(count):
+                    yield Comment(
+                        post_id=post_id,
+                        author_id=self.random.choices(
+                            authors, cum_weights=weights
+                        )[0],
+                        text=self.text(1, 2),
+                        created=self.created_after(created, 30),
+                    )
+
+        with self.stage('Комментариев') as counter:
+            self.insert(Comment, comments(), counter)
+
+    def rebuild_timelines(self, users):
+        if not users:
+            return
+        with self.stage('Лент подписок') as counter:
+            followers = Follow.objects.filter(
+                user_id__gte=min(users)
+            ).values_list('user_id', flat=True).distinct()
+            for user_id in followers.iterator():
+                timeline.rebuild(user_id)
+                counter[0] += 1
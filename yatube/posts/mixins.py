@@ -0,0 +1,120 @@
+import hashlib
+
+from django.conf import settings
+from django.core.paginator import InvalidPage
+from django.http import Http404
+from django.views.decorators.http import condition
+
+from . import feed_cache, thumbnails
+from .paginators import CursorPaginator
+
+
+class CursorPaginationMixin:
+    """Serve ``?after=``/``?before=`` requests with keyset pagination.
+
+    Numbered pages keep working through ``?page=``; their "next" link
+    switches the client over to cursors, so deep pages never use OFFSET.
+    With ``numbered_pages`` off every request is served by cursor.
+    """
+    paginator_class = CursorPaginator
+    cursor_keys = None
+    after_kwarg = 'after'
+    before_kwarg = 'before'
+    numbered_pages = True
+
+    def get_count_key(self):
+        return None
+
+    def get_count_version(self):
+        return None
+
+    def get_paginator(self, *args, **kwargs):
+        return super().get_paginator(
+            *args,
+            keys=self.cursor_keys,
+            count_key=self.get_count_key(),
+            count_version=self.get_count_version(),
+            **kwargs,
+        )
+
+    def paginate_queryset(self, queryset, page_size):
+        after = self.request.GET.get(self.after_kwarg)
+        before = self.request.GET.get(self.before_kwarg)
+        if self.numbered_pages and after is None and before is None:
+            paginator, page, object_list, is_paginated = (
+                super().paginate_queryset(queryset, page_size)
+            )
+            if page.has_next() and len(page):
+                page.next_cursor = paginator.encode_cursor(page[-1])
+            return paginator, page, object_list, is_paginated
+
+        paginator = self.get_paginator(
+            queryset,
+            page_size,
+            orphans=self.get_paginate_orphans(),
+            allow_empty_first_page=self.get_allow_empty(),
+        )
+        try:
+            page = paginator.cursor_page(after=after, before=before)
+        except InvalidPage as error:
+            raise Http404(str(error))
+        return paginator, page, page.object_list, page.has_other_pages()
+
+
+class FeedCacheMixin:
+    """Provide the key of the ``{% cache %}`` fragment holding the feed.
+
+    The key combines the feed name, the generation bumped by
+    ``posts.signals`` on any change a feed shows and the requested page
+    or cursor, so the fragment never outlives its data.
+    """
+    feed_name = None
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['feed_cache_timeout'] = settings.FEED_CACHE_TIMEOUT
+        context['feed_cache_key'] = feed_cache.page_key(
+            self.feed_name, self.request.GET, self.page_kwarg
+        )
+        return context
+
+
+class ThumbnailPrefetchMixin:
+    """Look up the thumbnails of the whole page in one batch."""
+    thumbnail_aliases = ('card',)
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        thumbnails.prefetch(context['page_obj'], self.thumbnail_aliases)
+        return context
+
+
+class ConditionalGetMixin:
+    """Answer a revisit with 304 while nothing on the page has changed.
+
+    The ETag covers the URL, the viewer and ``get_etag_parts()``: the
+    generations of ``posts.feed_cache`` the page depends on, which
+    cost a cache read instead of a render. Views add the narrowest
+    generations that cover their content, so a new post elsewhere
+    does not turn every other page into a 200. The CSRF secret is part of
+    it too, otherwise a page kept from before a new login would post
+    its forms with a rotated token.
+    """
+
+    def get_etag_parts(self):
+        return [feed_cache.site_generation()]
+
+    def get_viewer_parts(self, request):
+        return [request.user.pk, request.META.get('CSRF_COOKIE')]
+
+    def get_etag(self, request, *args, **kwargs):
+        parts = [
+            request.get_full_path(),
+            *self.get_viewer_parts(request),
+            *self.get_etag_parts(),
+        ]
+        return hashlib.md5(':'.join(map(str, parts)).encode()).hexdigest()
+
+    def dispatch(self, request, *args, **kwargs):
+        view = condition(etag_func=self.get_etag)(super().dispatch)
+        return view(request, *args, **kwargs)
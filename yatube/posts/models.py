@@ -1,6 +1,9 @@
 from core.models import CreatedModel
 from django.contrib.auth import get_user_model
 from django.db import models
+
+from .storage import ContentAddressedStorage
+
 User = get_user_model()
 
 
@@ -24,6 +27,36 @@ class Group(models.Model):
         return self.title
 
 
+class PostQuerySet(models.QuerySet):
+    def for_feed(self):
+        return self.select_related('author', 'group').only(
+            'text',
+            'created',
+            'image',
+            'comment_count',
+            'author',
+            'group',
+            'author__username',
+            'author__first_name',
+            'author__last_name',
+            'group__title',
+            'group__slug',
+        )
+
+
+class CommentQuerySet(models.QuerySet):
+    def for_post(self, post_id):
+        return self.filter(post_id=post_id).select_related('author').only(
+            'text',
+            'created',
+            'post',
+            'author',
+            'author__username',
+            'author__first_name',
+            'author__last_name',
+        )
+
+
 class Post(CreatedModel):
     text = models.TextField(
         verbose_name='текст поста',
@@ -34,6 +67,7 @@ class Post(CreatedModel):
         on_delete=models.CASCADE,
         related_name='posts',
         verbose_name='автор',
+        db_index=False,
     )
     group = models.ForeignKey(
         Group,
@@ -42,18 +76,40 @@ class Post(CreatedModel):
         null=True,
         related_name='posts',
         verbose_name='группа',
+        db_index=False,
         help_text='группа, к которой будет относиться пост',
     )
     image = models.ImageField(
         'картинка',
         upload_to='posts/',
+        storage=ContentAddressedStorage(),
         blank=True,
     )
+    comment_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='количество комментариев',
+    )
+
+    objects = PostQuerySet.as_manager()
 
     class Meta:
         ordering = ['-created']
         verbose_name = 'пост'
         verbose_name_plural = 'посты'
+        indexes = [
+            models.Index(
+                fields=['-created', '-id'],
+                name='post_created_idx',
+            ),
+            models.Index(
+                fields=['author', '-created', '-id'],
+                name='post_author_created_idx',
+            ),
+            models.Index(
+                fields=['group', '-created', '-id'],
+                name='post_group_created_idx',
+            ),
+        ]
 
     def __str__(self):
         return self.text[:15]
@@ -65,6 +121,7 @@ class Comment(CreatedModel):
         on_delete=models.CASCADE,
         related_name='comments',
         verbose_name='пост',
+        db_index=False,
     )
     author = models.ForeignKey(
         User,
@@ -77,10 +134,18 @@ class Comment(CreatedModel):
         help_text='оставте комментарий к посту',
     )
 
+    objects = CommentQuerySet.as_manager()
+
     class Meta:
         ordering = ['-created']
         verbose_name = 'Коментарий'
         verbose_name_plural = 'Коментарии'
+        indexes = [
+            models.Index(
+                fields=['post', '-created', '-id'],
+                name='comment_post_created_idx',
+            ),
+        ]
 
     def __str__(self):
         return self.text[:15]
@@ -92,6 +157,7 @@ class Follow(models.Model):
         on_delete=models.CASCADE,
         related_name='follower',
         verbose_name='подписчик',
+        db_index=False,
     )
     author = models.ForeignKey(
         User,
@@ -111,3 +177,82 @@ class Follow(models.Model):
                 name='cant subscribe to yourself',
             ),
         ]
+        indexes = [
+            models.Index(
+                fields=['user', 'author'],
+                name='follow_user_author_idx',
+            ),
+        ]
+
+
+class UserStats(models.Model):
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='stats',
+        verbose_name='пользователь',
+    )
+    posts_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='количество постов',
+    )
+    followers_count = models.PositiveIntegerField(
+        default=0,
+        db_index=True,
+        verbose_name='количество подписчиков',
+    )
+    following_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='количество подписок',
+    )
+
+    class Meta:
+        verbose_name = 'статистика пользователя'
+        verbose_name_plural = 'статистика пользователей'
+
+
+class TimelineEntry(models.Model):
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='timeline',
+        verbose_name='подписчик',
+        db_index=False,
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='timeline_entries',
+        verbose_name='пост',
+    )
+    created = models.DateTimeField(verbose_name='дата публикации')
+
+    class Meta:
+        ordering = ['-created']
+        verbose_name = 'запись ленты'
+        verbose_name_plural = 'записи ленты'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'post'],
+                name='unique timeline entry',
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=['user', '-created', '-post'],
+                name='timeline_user_created_idx',
+            ),
+        ]
+
+
+def profiles(viewer):
+    """Users with their stats and ``is_followed`` by ``viewer``."""
+    users = User.objects.select_related('stats')
+    if not viewer.is_authenticated:
+        return users.annotate(is_followed=models.Value(
+            False, models.BooleanField()
+        ))
+    return users.annotate(is_followed=models.Exists(
+        Follow.objects.filter(user_id=viewer.pk, author=models.OuterRef('pk'))
+    ))
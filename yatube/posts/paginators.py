@@ -0,0 +1,280 @@
+import heapq
+import json
+from datetime import datetime, timedelta
+from operator import attrgetter
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.paginator import EmptyPage, InvalidPage, Page, Paginator
+from django.db import connections
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.functional import cached_property
+from django.utils.http import urlsafe_base64_decode, urlsafe_base64_encode
+
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+def feed_count_key(feed, pk=None):
+    if pk is None:
+        return f'feed_count:{feed}'
+    return f'feed_count:{feed}:{pk}'
+
+
+class InvalidCursor(InvalidPage):
+    pass
+
+
+class CursorPage(Page):
+    is_cursor = True
+
+    def __init__(self, object_list, paginator, has_next, has_previous):
+        super().__init__(object_list, None, paginator)
+        self._has_next = has_next
+        self._has_previous = has_previous
+
+    def __repr__(self):
+        return '<Cursor page>'
+
+    def has_next(self):
+        return self._has_next
+
+    def has_previous(self):
+        return self._has_previous
+
+    @property
+    def next_cursor(self):
+        if self.has_next() and self.object_list:
+            return self.paginator.encode_cursor(self.object_list[-1])
+        return None
+
+    @property
+    def previous_cursor(self):
+        if self.has_previous() and self.object_list:
+            return self.paginator.encode_cursor(self.object_list[0])
+        return None
+
+
+class CachedCountPaginator(Paginator):
+    """Paginator that keeps the feed size in the cache.
+
+    The count is computed at most once per ``FEED_COUNT_CACHE_TIMEOUT``
+    and never scans more than ``FEED_COUNT_ESTIMATE_THRESHOLD`` rows:
+    above that the planner estimate is used where the database offers
+    one, otherwise the threshold itself. ``estimated`` tells which.
+    Keys are dropped by the signal handlers in ``posts.signals``; where
+    that is too many keys, ``count_version`` is stored with the count
+    and a count cached for another version is computed again.
+    """
+    estimated = False
+
+    def __init__(self, *args, count_key=None, count_version=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.count_key = count_key
+        self.count_version = count_version
+
+    @cached_property
+    def count(self):
+        cached = None
+        if self.count_key is not None:
+            cached = cache.get(self.count_key)
+        if cached is None or cached[2:] != (self.count_version,):
+            cached = (*self.bounded_count(), self.count_version)
+            if self.count_key is not None:
+                cache.set(
+                    self.count_key,
+                    cached,
+                    settings.FEED_COUNT_CACHE_TIMEOUT,
+                )
+        count, self.estimated, _ = cached
+        return count
+
+    def bounded_count(self):
+        threshold = settings.FEED_COUNT_ESTIMATE_THRESHOLD
+        queryset = self.object_list.order_by().values('pk')
+        count = queryset[:threshold + 1].count()
+        if count <= threshold:
+            return count, False
+        return max(self.estimate_count(queryset), threshold), True
+
+    @staticmethod
+    def estimate_count(queryset):
+        connection = connections[queryset.db]
+        if connection.vendor != 'postgresql':
+            return 0
+        sql, params = queryset.query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+            plan = cursor.fetchone()[0]
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return int(plan[0]['Plan']['Plan Rows'])
+
+
+class LookaheadPaginator(Paginator):
+    """Paginator that counts a few pages past the current one only.
+
+    Lists too long to count need no total to be walked: ``count`` stops
+    ``lookahead`` pages after ``number``, so the links always reach
+    that far and new ones appear as the reader moves on. ``estimated``
+    tells whether more rows may follow the counted ones.
+    """
+    lookahead = 5
+    estimated = False
+
+    def __init__(self, *args, number=1, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.number = number
+
+    @cached_property
+    def count(self):
+        limit = (self.number + self.lookahead) * self.per_page
+        count = self.object_list.order_by().values('pk')[:limit + 1].count()
+        self.estimated = count > limit
+        return min(count, limit)
+
+
+class CursorPaginator(CachedCountPaginator):
+    """Paginator keyed on (created, id) instead of LIMIT/OFFSET.
+
+    Classic numbered pages are still served by ``page()``, cursor pages
+    by ``cursor_page()``; both use the same ordering. ``keys`` are the
+    names of the timestamp and the tie-breaker columns, both must be
+    readable as attributes of the objects in ``object_list``.
+    """
+    keys = ('created', 'id')
+
+    def __init__(self, object_list, per_page, *args, keys=None, **kwargs):
+        if keys is not None:
+            self.keys = keys
+        created_key, id_key = self.keys
+        object_list = object_list.order_by(f'-{created_key}', f'-{id_key}')
+        super().__init__(object_list, per_page, *args, **kwargs)
+
+    def encode_cursor(self, obj):
+        created, pk = (getattr(obj, key) for key in self.keys)
+        delta = created - EPOCH
+        microseconds = (
+            (delta.days * 86400 + delta.seconds) * 10 ** 6
+            + delta.microseconds
+        )
+        return urlsafe_base64_encode(f'{microseconds}.{pk}'.encode())
+
+    def decode_cursor(self, cursor):
+        try:
+            microseconds, pk = (
+                urlsafe_base64_decode(cursor).decode().split('.')
+            )
+            return EPOCH + timedelta(microseconds=int(microseconds)), int(pk)
+        except (ValueError, OverflowError, UnicodeDecodeError):
+            raise InvalidCursor('Некорректный курсор страницы')
+
+    def window(self, queryset, cursor, backwards, size=None):
+        created_key, id_key = self.keys
+        if cursor is not None:
+            created, pk = cursor
+            lookup = 'gt' if backwards else 'lt'
+            queryset = queryset.filter(
+                Q(**{f'{created_key}__{lookup}': created})
+                | Q(**{created_key: created, f'{id_key}__{lookup}': pk})
+            )
+        if backwards:
+            queryset = queryset.order_by(created_key, id_key)
+        return list(queryset[:size or self.per_page + 1])
+
+    def fetch(self, cursor, backwards):
+        return self.window(self.object_list, cursor, backwards)
+
+    def cursor_page(self, after=None, before=None):
+        backwards = before is not None
+        cursor = before if backwards else after
+        if cursor is not None:
+            cursor = self.decode_cursor(cursor)
+
+        object_list = self.fetch(cursor, backwards)
+        has_more = len(object_list) > self.per_page
+        object_list = object_list[:self.per_page]
+
+        if backwards:
+            if not object_list:
+                return self.cursor_page()
+            object_list.reverse()
+            return CursorPage(
+                object_list, self, has_next=True, has_previous=has_more
+            )
+        if (
+            not object_list and after is None
+            and not self.allow_empty_first_page
+        ):
+            raise EmptyPage('Страница не содержит результатов')
+        return CursorPage(
+            object_list,
+            self,
+            has_next=has_more,
+            has_previous=after is not None,
+        )
+
+
+class MergedCursorPaginator(CursorPaginator):
+    """Cursor paginator over several querysets merged on the fly.
+
+    ``object_list`` is the whole feed as a single queryset and is only
+    used for counting. Pages are a k-way merge of ``sources``: querysets
+    which together hold the same objects, each read with its own index
+    range scan. All of them must expose the same ``keys``.
+
+    The merge reads every page before the requested one from each
+    source, so numbered pages stop at ``merged_pages`` and the feed
+    goes on by cursor. A single source has no merge to do: its numbered
+    pages are read with OFFSET along its own index, however deep.
+    """
+    merged_pages = 3
+
+    def __init__(self, object_list, per_page, *args, sources=(), **kwargs):
+        super().__init__(object_list, per_page, *args, **kwargs)
+        created_key, id_key = self.keys
+        self.sources = [
+            source.order_by(f'-{created_key}', f'-{id_key}')
+            for source in sources
+        ]
+
+    def merge(self, cursor, backwards, size):
+        merged = heapq.merge(
+            *(
+                self.window(source, cursor, backwards, size)
+                for source in self.sources
+            ),
+            key=attrgetter(*self.keys),
+            reverse=not backwards,
+        )
+        object_list = []
+        seen = set()
+        for obj in merged:
+            if obj.pk in seen:
+                continue
+            seen.add(obj.pk)
+            object_list.append(obj)
+            if len(object_list) == size:
+                break
+        return object_list
+
+    def fetch(self, cursor, backwards):
+        return self.merge(cursor, backwards, self.per_page + 1)
+
+    @property
+    def last_numbered_page(self):
+        if len(self.sources) > 1:
+            return min(self.num_pages, self.merged_pages)
+        return self.num_pages
+
+    def page(self, number):
+        number = self.validate_number(number)
+        if number > self.last_numbered_page:
+            raise EmptyPage('Дальше лента листается по ссылке «Следующая»')
+        bottom = (number - 1) * self.per_page
+        if len(self.sources) == 1:
+            object_list = self.sources[0][bottom:bottom + self.per_page]
+        else:
+            object_list = self.merge(None, False, bottom + self.per_page)
+            object_list = object_list[bottom:]
+        return self._get_page(object_list, number, self)
@@ -0,0 +1,193 @@
+import re
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connection, connections
+from django.db.migrations.recorder import MigrationRecorder
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+
+from .models import Post
+
+FTS_TABLE = 'posts_post_fts'
+SCHEMA_MIGRATION = ('posts', '0017_post_search')
+# The objects of migration 0017, each recreated on its own if missing.
+SCHEMA = {
+    FTS_TABLE: f'''
+        CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+            text,
+            content='posts_post',
+            content_rowid='id',
+            tokenize='unicode61 remove_diacritics 2'
+        )
+    ''',
+    f'{FTS_TABLE}_insert': f'''
+        CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_insert
+        AFTER INSERT ON posts_post BEGIN
+            INSERT INTO {FTS_TABLE}(rowid, text) VALUES (new.id, new.text);
+        END
+    ''',
+    f'{FTS_TABLE}_delete': f'''
+        CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_delete
+        AFTER DELETE ON posts_post BEGIN
+            INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, text)
+            VALUES ('delete', old.id, old.text);
+        END
+    ''',
+    f'{FTS_TABLE}_update': f'''
+        CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_update
+        AFTER UPDATE OF text ON posts_post BEGIN
+            INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, text)
+            VALUES ('delete', old.id, old.text);
+            INSERT INTO {FTS_TABLE}(rowid, text) VALUES (new.id, new.text);
+        END
+    ''',
+}
+# Control characters cannot come from the search form, so they are safe
+# to mark the match boundaries before the snippet is HTML-escaped.
+MATCH_START = '\x02'
+MATCH_END = '\x03'
+
+TERM = re.compile(r'\w+')
+
+
+def is_available():
+    return connection.vendor == 'sqlite'
+
+
+def match_expression(query):
+    """Turn user input into an FTS5 query: every word must be present,
+    the last one may be a prefix. Operators of the FTS5 syntax are not
+    exposed, so any input is a valid expression.
+    """
+    terms = TERM.findall(query)
+    if not terms:
+        return None
+    terms = [f'"{term}"' for term in terms]
+    terms[-1] += '*'
+    return ' '.join(terms)
+
+
+def highlight(snippet):
+    return mark_safe(
+        escape(snippet)
+        .replace(MATCH_START, '<mark>')
+        .replace(MATCH_END, '</mark>')
+    )
+
+
+def matching_ids(query, limit):
+    """Ids of the ``limit`` best posts matching ``query``, best first."""
+    expression = match_expression(query)
+    if expression is None:
+        return []
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s '
+            f'ORDER BY rank LIMIT %s',
+            [expression, limit],
+        )
+        return [pk for pk, in cursor.fetchall()]
+
+
+def ensure_schema(using=DEFAULT_DB_ALIAS):
+    """Recreate the parts of the index missing once 0017 is applied.
+
+    SQLite copies posts_post into a new table for most ALTER TABLEs and
+    its triggers are lost on the way, so posts written since then are
+    not indexed: after recreating anything the index is rebuilt.
+    Returns the names of the recreated objects.
+    """
+    db = connections[using]
+    if db.vendor != 'sqlite':
+        return []
+    if SCHEMA_MIGRATION not in MigrationRecorder(db).applied_migrations():
+        return []
+    with db.cursor() as cursor:
+        cursor.execute(
+            'SELECT name FROM sqlite_master WHERE name IN (%s)'
+            % ', '.join(['%s'] * len(SCHEMA)),
+            list(SCHEMA),
+        )
+        missing = set(SCHEMA).difference(name for name, in cursor)
+        if not missing:
+            return []
+        for statement in SCHEMA.values():
+            cursor.execute(statement)
+        cursor.execute(
+            f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')"
+        )
+    return sorted(missing)
+
+
+def rebuild():
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')"
+        )
+
+
+def optimize():
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('optimize')"
+        )
+
+
+class SearchResults:
+    """Ranked posts matching ``query`` as a sliceable sequence.
+
+    Only the requested slice is read from the index, in bm25 order, and
+    then joined with the feed columns of the posts. ``count()`` stops at
+    ``SEARCH_MAX_RESULTS`` so a common word never counts the whole index.
+    """
+
+    def __init__(self, query):
+        self.expression = match_expression(query)
+
+    def count(self):
+        if self.expression is None:
+            return 0
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT COUNT(*) FROM (SELECT 1 FROM {FTS_TABLE} '
+                f'WHERE {FTS_TABLE} MATCH %s LIMIT %s)',
+                [self.expression, settings.SEARCH_MAX_RESULTS],
+            )
+            return cursor.fetchone()[0]
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            raise TypeError('SearchResults supports slicing only')
+        if self.expression is None:
+            return []
+        offset = index.start or 0
+        limit = min(index.stop, settings.SEARCH_MAX_RESULTS) - offset
+        if limit <= 0:
+            return []
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT rowid, snippet({FTS_TABLE}, 0, %s, %s, %s, %s) '
+                f'FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s '
+                f'ORDER BY rank LIMIT %s OFFSET %s',
+                [
+                    MATCH_START,
+                    MATCH_END,
+                    '…',
+                    settings.SEARCH_SNIPPET_TOKENS,
+                    self.expression,
+                    limit,
+                    offset,
+                ],
+            )
+            snippets = dict(cursor.fetchall())
+        posts = Post.objects.for_feed().in_bulk(list(snippets))
+        results = []
+        for pk, snippet in snippets.items():
+            if pk in posts:
+                post = posts[pk]
+                post.snippet = highlight(snippet)
+                results.append(post)
+        return results
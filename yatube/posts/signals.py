@@ -0,0 +1,168 @@
+from django.core.cache import cache
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from . import (
+    autocomplete,
+    feed_cache,
+    group_cache,
+    search,
+    stats,
+    timeline,
+)
+from .models import Comment, Follow, Group, Post, User, UserStats
+from .paginators import feed_count_key
+
+# Fields of the author shown next to every post in a feed.
+AUTHOR_FEED_FIELDS = frozenset(('username', 'first_name', 'last_name'))
+
+
+def invalidate_post_counts(post, user_ids=(), group_ids=()):
+    keys = [
+        feed_count_key('index'),
+        feed_count_key('author', post.author_id),
+    ]
+    keys.extend(
+        feed_count_key('group', group_id)
+        for group_id in {post.group_id, *group_ids} - {None}
+    )
+    keys.extend(feed_count_key('follow', user_id) for user_id in user_ids)
+    cache.delete_many(keys)
+
+
+def bump_post_pages(post_id):
+    post = (
+        Post
+        .objects
+        .select_related('author')
+        .only('group_id', 'author__username')
+        .filter(pk=post_id)
+        .first()
+    )
+    if post is not None:
+        feed_cache.bump_post(post)
+
+
+@receiver(pre_save, sender=Post)
+def post_saving(sender, instance, update_fields, **kwargs):
+    # The group a post is moved out of loses it from its pages.
+    instance.previous_group_id = None
+    if instance.pk is None:
+        return
+    if update_fields is not None and update_fields.isdisjoint(
+        ('group', 'group_id')
+    ):
+        return
+    instance.previous_group_id = (
+        Post
+        .objects
+        .filter(pk=instance.pk)
+        .values_list('group_id', flat=True)
+        .first()
+    )
+
+
+@receiver(post_save, sender=Post)
+def post_saved(sender, instance, created, **kwargs):
+    user_ids = ()
+    if created:
+        stats.adjust_user(instance.author_id, 'posts_count', 1)
+        if instance.author_id in timeline.pull_author_ids():
+            feed_cache.bump_author_posts(instance.author_id)
+        else:
+            user_ids = list(timeline.follower_ids(instance.author_id))
+            timeline.fan_out(instance, user_ids)
+    group_ids = {getattr(instance, 'previous_group_id', None)}
+    group_ids.discard(instance.group_id)
+    invalidate_post_counts(instance, user_ids, group_ids)
+    feed_cache.bump_post(instance, group_ids)
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    stats.adjust_user(instance.author_id, 'posts_count', -1)
+    user_ids = ()
+    if instance.author_id in timeline.pull_author_ids():
+        feed_cache.bump_author_posts(instance.author_id)
+    else:
+        user_ids = timeline.follower_ids(instance.author_id)
+    invalidate_post_counts(instance, user_ids)
+    feed_cache.bump_post(instance)
+
+
+@receiver(post_save, sender=Follow)
+def follow_created(sender, instance, created, **kwargs):
+    if not created:
+        return
+    stats.adjust_user(instance.author_id, 'followers_count', 1)
+    stats.adjust_user(instance.user_id, 'following_count', 1)
+    if instance.author_id not in timeline.pull_author_ids():
+        timeline.backfill(instance.user_id, instance.author_id)
+    cache.delete(feed_count_key('follow', instance.user_id))
+    feed_cache.bump_user_generation(instance.user.username)
+    feed_cache.bump_user_generation(instance.author.username)
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    was_pulled = instance.author_id in timeline.pull_author_ids()
+    stats.adjust_user(instance.author_id, 'followers_count', -1)
+    stats.adjust_user(instance.user_id, 'following_count', -1)
+    timeline.remove_author(instance.user_id, instance.author_id)
+    user_ids = [instance.user_id]
+    if was_pulled:
+        user_ids.extend(timeline.restore_push(instance.author_id))
+    cache.delete_many(
+        [feed_count_key('follow', user_id) for user_id in user_ids]
+    )
+    feed_cache.bump_user_generation(instance.user.username)
+    feed_cache.bump_user_generation(instance.author.username)
+
+
+@receiver(post_save, sender=Comment)
+def comment_created(sender, instance, created, **kwargs):
+    if created:
+        stats.adjust_post(instance.post_id, 1)
+        bump_post_pages(instance.post_id)
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    stats.adjust_post(instance.post_id, -1)
+    bump_post_pages(instance.post_id)
+
+
+@receiver(post_save, sender=Group)
+def group_saved(sender, instance, created, **kwargs):
+    group_cache.forget(instance)
+    autocomplete.update_group(instance)
+    if not created:
+        feed_cache.bump_site_generation()
+
+
+@receiver(post_delete, sender=Group)
+def group_deleted(sender, instance, **kwargs):
+    group_cache.forget(instance)
+    autocomplete.remove_group(instance)
+    feed_cache.bump_site_generation()
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, created, update_fields, **kwargs):
+    if created:
+        UserStats.objects.get_or_create(user=instance)
+        autocomplete.update_user(instance)
+        return
+    if update_fields is None or AUTHOR_FEED_FIELDS & update_fields:
+        feed_cache.bump_site_generation()
+        autocomplete.update_user(instance)
+
+
+@receiver(post_delete, sender=User)
+def user_deleted(sender, instance, **kwargs):
+    autocomplete.remove_user(instance)
+
+
+def ensure_search_schema(sender, using, **kwargs):
+    # Connected in PostsConfig.ready() to run after every migrate.
+    search.ensure_schema(using)
@@ -0,0 +1,78 @@
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from . import bulk
+from .models import Comment, Follow, Post, User, UserStats
+
+
+def adjust(queryset, field, delta):
+    if delta < 0:
+        queryset = queryset.filter(**{f'{field}__gte': -delta})
+    return queryset.update(**{field: F(field) + delta})
+
+
+def adjust_user(user_id, field, delta):
+    return adjust(UserStats.objects.filter(user_id=user_id), field, delta)
+
+
+def adjust_post(post_id, delta):
+    return adjust(Post.objects.filter(pk=post_id), 'comment_count', delta)
+
+
+def count_of(queryset, field):
+    return Coalesce(
+        Subquery(
+            queryset
+            .filter(**{field: OuterRef('pk')})
+            .order_by()
+            .values(field)
+            .annotate(count=Count('pk'))
+            .values('count')
+        ),
+        0,
+    )
+
+
+def user_counts():
+    return {
+        'posts_count': count_of(Post.objects, 'author'),
+        'followers_count': count_of(Follow.objects, 'author'),
+        'following_count': count_of(Follow.objects, 'user'),
+    }
+
+
+def post_counts():
+    return {'comment_count': count_of(Comment.objects, 'post')}
+
+
+def create_missing_stats(batch_size):
+    user_ids = User.objects.filter(stats__isnull=True).values_list(
+        'pk', flat=True
+    )
+    UserStats.objects.bulk_create(
+        (UserStats(user_id=user_id) for user_id in user_ids.iterator()),
+        batch_size=bulk.batch_size(UserStats, batch_size),
+        ignore_conflicts=True,
+    )
+
+
+def drifted(queryset, counts):
+    actual = {f'actual_{field}': value for field, value in counts.items()}
+    return queryset.annotate(**actual).exclude(
+        **{field: F(f'actual_{field}') for field in counts}
+    )
+
+
+def recount(queryset, counts, batch_size):
+    """Rewrite denormalized counters in primary key ranges.
+
+    Returns the number of rows whose counters had drifted.
+    """
+    drift = drifted(queryset, counts).count()
+    last_pk = queryset.order_by('-pk').values_list('pk', flat=True).first()
+    for start in range(0, (last_pk or 0) + 1, batch_size):
+        queryset.filter(
+            pk__gte=start,
+            pk__lt=start + batch_size,
+        ).update(**counts)
+    return drift
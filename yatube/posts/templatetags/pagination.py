@@ -0,0 +1,35 @@
+from collections import namedtuple
+
+from django import template
+
+register = template.Library()
+
+PageLinks = namedtuple('PageLinks', 'numbers last')
+ESTIMATED_WINDOW = 3
+
+
+@register.simple_tag
+def page_links(page_obj):
+    """Numbered pages to link from ``page_obj`` and the last one, if it
+    can be linked.
+
+    A paginator may stop numbered pages early with ``last_numbered_page``,
+    the rest of the list is then reached by cursor. When its count is
+    ``estimated`` the last page is unknown: only ``ESTIMATED_WINDOW``
+    pages around the current one are linked.
+    """
+    paginator = page_obj.paginator
+    last = getattr(paginator, 'last_numbered_page', paginator.num_pages)
+    if getattr(paginator, 'estimated', False):
+        number = page_obj.number
+        return PageLinks(
+            range(
+                max(number - ESTIMATED_WINDOW, 1),
+                min(number + ESTIMATED_WINDOW, last) + 1,
+            ),
+            None,
+        )
+    return PageLinks(
+        range(1, last + 1),
+        last if last == paginator.num_pages else None,
+    )
@@ -0,0 +1,69 @@
+from django import template
+from django.conf import settings
+
+from .. import thumbnails
+
+register = template.Library()
+
+MIME_TYPES = {
+    'JPEG': 'image/jpeg',
+    'PNG': 'image/png',
+    'GIF': 'image/gif',
+    'WEBP': 'image/webp',
+}
+
+
+def srcset(images):
+    return ', '.join(f'{image.url} {image.width}w' for image in images)
+
+
+@register.inclusion_tag('posts/includes/post_image.html')
+def post_image(post, alias):
+    """Responsive ``<picture>`` of the post image renditions.
+
+    Uses ``post.prefetched_thumbnails`` when the view has filled it and
+    falls back to the original image until every rendition is ready.
+    """
+    image = post.image
+    if not image:
+        return {'image': None}
+    prefetched = getattr(post, 'prefetched_thumbnails', {})
+    if alias in prefetched:
+        ready = prefetched[alias]
+    else:
+        ready = thumbnails.ready(image, alias)
+    if ready is None:
+        thumbnails.schedule(image)
+        return {'image': image}
+
+    config = settings.POST_IMAGES[alias]
+    by_format = {}
+    for rendition, thumbnail in ready:
+        by_format.setdefault(rendition.format, []).append(
+            (rendition, thumbnail)
+        )
+    *source_formats, img_format = config['formats']
+    img_renditions = by_format[img_format]
+    default_width = config['ratio'][0]
+    img = next(
+        (
+            thumbnail for rendition, thumbnail in img_renditions
+            if rendition.width == default_width
+        ),
+        img_renditions[-1][1],
+    )
+    return {
+        'image': image,
+        'sizes': config['sizes'],
+        'sources': [
+            {
+                'type': MIME_TYPES[image_format],
+                'srcset': srcset(
+                    thumbnail for _, thumbnail in by_format[image_format]
+                ),
+            }
+            for image_format in source_formats
+        ],
+        'img': img,
+        'img_srcset': srcset(thumbnail for _, thumbnail in img_renditions),
+    }
@@ -0,0 +1,98 @@
+from http import HTTPStatus
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..admin import PostAdmin
+from ..models import Comment, Follow, Group, Post
+from ..paginators import LookaheadPaginator
+
+User = get_user_model()
+
+
+class AdminTest(TestCase):
+    POST_COUNT = 5
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+
+        cls.admin = User.objects.create_superuser(
+            username='admin', email='admin@example.com', password='pass'
+        )
+        cls.author = User.objects.create_user(username='author')
+        cls.group = Group.objects.create(
+            title='Группа для теста',
+            slug='group_test',
+            description='Описание'
+        )
+        for i in range(cls.POST_COUNT):
+            post = Post.objects.create(
+                author=cls.author,
+                text=f'Пост для админки №{i + 1}',
+                group=cls.group,
+            )
+            Comment.objects.create(
+                post=post, author=cls.admin, text=f'Комментарий №{i + 1}'
+            )
+        Post.objects.create(author=cls.admin, text='Совсем другой текст')
+        Follow.objects.create(user=cls.admin, author=cls.author)
+
+        cls.CHANGELISTS = {
+            Post: reverse('admin:posts_post_changelist'),
+            Comment: reverse('admin:posts_comment_changelist'),
+            Follow: reverse('admin:posts_follow_changelist'),
+        }
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.admin)
+        cache.clear()
+
+    def test_changelist_queries_do_not_depend_on_rows(self):
+        '''Списки админки не делают запросов на каждую строку'''
+        for model, url in self.CHANGELISTS.items():
+            with self.subTest(model=model.__name__):
+                # Сессия, пользователь, число строк и сами строки.
+                with self.assertNumQueries(4):
+                    response = self.client.get(url)
+                self.assertEqual(response.status_code, HTTPStatus.OK)
+
+    def test_search(self):
+        '''Поиск по тексту поста и логину автора'''
+        url = self.CHANGELISTS[Post]
+        queries_counts = {
+            'админки': self.POST_COUNT,
+            'author': self.POST_COUNT,
+            'auth': 0,
+            'другой': 1,
+        }
+        for query, count in queries_counts.items():
+            with self.subTest(query=query):
+                response = self.client.get(url, {'q': query})
+                self.assertEqual(response.context['cl'].result_count, count)
+
+        response = self.client.get(self.CHANGELISTS[Comment], {'q': 'admin'})
+        self.assertEqual(
+            response.context['cl'].result_count, self.POST_COUNT
+        )
+
+    def test_pages_reachable_without_total(self):
+        '''Все страницы админки доступны без подсчета всей таблицы'''
+        url = self.CHANGELISTS[Post]
+        total = Post.objects.count()
+        with mock.patch.object(PostAdmin, 'list_per_page', 1), \
+                mock.patch.object(LookaheadPaginator, 'lookahead', 1):
+            cl = self.client.get(url).context['cl']
+            self.assertEqual(cl.result_count, 2)
+            self.assertTrue(cl.paginator.estimated)
+
+            cl = self.client.get(url, {'p': total - 1}).context['cl']
+            self.assertEqual(cl.result_count, total)
+            self.assertFalse(cl.paginator.estimated)
+            self.assertEqual(
+                list(cl.result_list), [Post.objects.order_by('pk').first()]
+            )
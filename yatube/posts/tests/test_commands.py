@@ -0,0 +1,454 @@
+import csv
+import gzip
+import json
+import os
+import shutil
+import tempfile
+from datetime import datetime, timedelta
+from io import StringIO
+from unittest import skipUnless
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.db.models import F, Sum
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from .. import feed_cache, search, signals
+from ..models import (
+    Comment,
+    Follow,
+    Group,
+    Post,
+    TimelineEntry,
+    UserStats,
+)
+
+User = get_user_model()
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+class RecountStatsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+
+        cls.author = User.objects.create_user(username='author')
+        cls.follower = User.objects.create_user(username='follower')
+        cls.post = Post.objects.create(author=cls.author, text='Пост')
+        Comment.objects.create(
+            post=cls.post, author=cls.follower, text='Комментарий'
+        )
+        Follow.objects.create(user=cls.follower, author=cls.author)
+
+    def test_recount_repairs_drift(self):
+        '''recount_stats исправляет разошедшиеся счетчики'''
+        UserStats.objects.update(
+            posts_count=7, followers_count=7, following_count=7
+        )
+        UserStats.objects.filter(user=self.follower).delete()
+        Post.objects.update(comment_count=7)
+
+        out = StringIO()
+        call_command('recount_stats', batch_size=1, stdout=out)
+
+        self.assertEqual(
+            UserStats.objects.get(user=self.author).posts_count, 1
+        )
+        self.assertEqual(
+            UserStats.objects.get(user=self.author).followers_count, 1
+        )
+        self.assertEqual(
+            UserStats.objects.get(user=self.follower).following_count, 1
+        )
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comment_count, 1)
+        self.assertIn('Расхождений у постов: 1', out.getvalue())
+
+    def test_dry_run(self):
+        '''recount_stats --dry-run ничего не меняет'''
+        Post.objects.update(comment_count=7)
+        call_command('recount_stats', dry_run=True, stdout=StringIO())
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comment_count, 7)
+
+
+@skipUnless(connection.vendor == 'sqlite', 'FTS5 из SQLite')
+class RebuildSearchIndexTest(TestCase):
+    def test_rebuild_restores_index(self):
+        '''rebuild_search_index восстанавливает потерянный индекс'''
+        author = User.objects.create_user(username='author')
+        post = Post.objects.create(author=author, text='Потерянный пост')
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"INSERT INTO {search.FTS_TABLE}({search.FTS_TABLE}) "
+                "VALUES ('delete-all')"
+            )
+        self.assertFalse(search.SearchResults('потерянный')[:10])
+
+        call_command('rebuild_search_index', optimize=True, stdout=StringIO())
+
+        self.assertEqual(search.SearchResults('потерянный')[:10], [post])
+
+    def test_lost_triggers_recreated(self):
+        '''Потерянные при пересоздании таблицы триггеры возвращаются'''
+        author = User.objects.create_user(username='author')
+        with connection.cursor() as cursor:
+            for trigger in ('insert', 'delete', 'update'):
+                cursor.execute(
+                    f'DROP TRIGGER {search.FTS_TABLE}_{trigger}'
+                )
+        post = Post.objects.create(author=author, text='Пост без триггера')
+        self.assertFalse(search.SearchResults('триггера')[:10])
+
+        out = StringIO()
+        call_command('rebuild_search_index', stdout=out)
+        self.assertIn(f'{search.FTS_TABLE}_insert', out.getvalue())
+        self.assertEqual(search.SearchResults('триггера')[:10], [post])
+        post = Post.objects.create(author=author, text='Пост с триггером')
+        self.assertEqual(search.SearchResults('триггером')[:10], [post])
+
+        # То же делает обработчик post_migrate после миграций.
+        with connection.cursor() as cursor:
+            cursor.execute(f'DROP TRIGGER {search.FTS_TABLE}_insert')
+        signals.ensure_search_schema(sender=None, using=connection.alias)
+        post = Post.objects.create(author=author, text='Пост после миграции')
+        self.assertEqual(search.SearchResults('миграции')[:10], [post])
+        self.assertEqual(search.ensure_schema(), [])
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ImportPostsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+
+        cls.author = User.objects.create_user(username='author')
+        cls.follower = User.objects.create_user(username='follower')
+        Follow.objects.create(user=cls.follower, author=cls.author)
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание'
+        )
+        cls.directory = tempfile.mkdtemp()
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.directory, ignore_errors=True)
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def write(self, name, content, directory=None):
+        path = os.path.join(directory or self.directory, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        mode = 'wb' if isinstance(content, bytes) else 'w'
+        encoding = None if isinstance(content, bytes) else 'utf-8'
+        with open(path, mode, encoding=encoding) as file:
+            file.write(content)
+        return path
+
+    def import_posts(self, path, **options):
+        out = StringIO()
+        err = StringIO()
+        call_command(
+            'import_posts', path, stdout=out, stderr=err, **options
+        )
+        return out.getvalue(), err.getvalue()
+
+    def test_import_jsonl(self):
+        '''import_posts загружает JSONL и пропускает плохие строки'''
+        rows = [
+            {'author': 'author', 'group': 'group', 'text': 'Первый'},
+            {'author': 'author', 'text': 'Второй', 'image': 'posts/a.jpg'},
+            {'author': 'nobody', 'text': 'Чужой'},
+            {'author': 'author', 'group': 'missing', 'text': 'Без группы'},
+            {'author': 'author', 'text': ''},
+            {'author': 'author', 'text': 'Третий'},
+        ]
+        content = '\n'.join(json.dumps(row) for row in rows) + '\n{oops\n'
+        self.write('posts/a.jpg', b'jpeg', directory=TEMP_MEDIA_ROOT)
+        generation = feed_cache.generation()
+
+        out, err = self.import_posts(
+            self.write('posts.jsonl', content), batch_size=2
+        )
+
+        self.assertIn('Импортировано постов: 3, пропущено строк: 4', out)
+        self.assertIn('строк/с', out)
+        for number in (3, 4, 5, 7):
+            with self.subTest(number=number):
+                self.assertIn(f'Строка {number} пропущена', err)
+        posts = Post.objects.filter(author=self.author)
+        self.assertEqual(
+            set(posts.values_list('text', flat=True)),
+            {'Первый', 'Второй', 'Третий'},
+        )
+        self.assertEqual(posts.get(text='Первый').group, self.group)
+        self.assertEqual(posts.get(text='Второй').image.name, 'posts/a.jpg')
+        self.assertEqual(
+            UserStats.objects.get(user=self.author).posts_count, 3
+        )
+        self.assertEqual(
+            TimelineEntry.objects.filter(user=self.follower).count(), 3
+        )
+        self.assertNotEqual(feed_cache.generation(), generation)
+
+    def test_import_csv(self):
+        '''import_posts загружает CSV'''
+        path = self.write(
+            'posts.csv',
+            'author,group,text,image\n'
+            'author,group,"Пост, с запятой",\n'
+            'author,,Пост без группы,\n',
+        )
+        out, _ = self.import_posts(path)
+        self.assertIn('Импортировано постов: 2, пропущено строк: 0', out)
+        self.assertEqual(self.group.posts.get().text, 'Пост, с запятой')
+
+    def test_import_created(self):
+        '''import_posts сохраняет дату публикации из файла'''
+        path = self.write(
+            'created.csv',
+            'author,text,created\n'
+            'author,Старый пост,2015-03-01T10:00:00+03:00\n'
+            'author,Пост без даты,\n'
+            'author,Пост с плохой датой,вчера\n',
+        )
+        out, err = self.import_posts(path)
+        self.assertIn('Импортировано постов: 2, пропущено строк: 1', out)
+        self.assertIn('Строка 3 пропущена: некорректная дата', err)
+        posts = Post.objects.filter(author=self.author)
+        self.assertEqual(
+            posts.get(text='Старый пост').created,
+            datetime(2015, 3, 1, 7, tzinfo=timezone.utc),
+        )
+        self.assertEqual(
+            posts.get(text='Пост без даты').created.date(),
+            timezone.now().date(),
+        )
+        self.assertTrue(Post._meta.get_field('created').auto_now_add)
+
+    def test_import_images(self):
+        '''Картинки сохраняются в хранилище, чужие пути отклоняются'''
+        images = os.path.join(self.directory, 'images')
+        self.write('photo.JPG', b'jpeg', directory=images)
+        self.write('secret.jpg', b'secret', directory=self.directory)
+        rows = [
+            {'author': 'author', 'text': 'Фото', 'image': 'photo.JPG'},
+            {'author': 'author', 'text': 'Выход', 'image': '../secret.jpg'},
+            {'author': 'author', 'text': 'Нет файла', 'image': 'none.jpg'},
+        ]
+        path = self.write(
+            'images.jsonl', '\n'.join(json.dumps(row) for row in rows)
+        )
+
+        out, err = self.import_posts(path, images_dir=images)
+        self.assertIn('Импортировано постов: 1, пропущено строк: 2', out)
+        for number in (2, 3):
+            with self.subTest(number=number):
+                self.assertIn(f'Строка {number} пропущена: нет картинки', err)
+        image = Post.objects.get(text='Фото').image
+        self.assertRegex(image.name, r'^posts/\w\w/\w\w/\w{64}\.jpg$')
+        self.assertTrue(image.storage.exists(image.name))
+
+        rows = [
+            {'author': 'author', 'text': 'Загружено', 'image': image.name},
+            {
+                'author': 'author',
+                'text': 'Вне MEDIA_ROOT',
+                'image': os.path.join(self.directory, 'secret.jpg'),
+            },
+        ]
+        path = self.write(
+            'stored.jsonl', '\n'.join(json.dumps(row) for row in rows)
+        )
+        out, err = self.import_posts(path)
+        self.assertIn('Импортировано постов: 1, пропущено строк: 1', out)
+        self.assertEqual(
+            Post.objects.get(text='Загружено').image.name, image.name
+        )
+
+    def test_unknown_format(self):
+        '''Формат без расширения нужно указать явно'''
+        with self.assertRaises(CommandError):
+            self.import_posts(self.write('posts.txt', ''))
+
+
+class ExportDataTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.posts = [
+            Post.objects.create(author=cls.author, text=f'Пост {i}')
+            for i in range(3)
+        ]
+        Comment.objects.create(
+            post=cls.posts[0], author=cls.reader, text='Комментарий, с запятой'
+        )
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+
+    def export(self, model, name, **options):
+        path = os.path.join(self.directory, name)
+        call_command(
+            'export_data', model, output=path, chunk_size=2,
+            stdout=StringIO(), **options
+        )
+        return path
+
+    def read_jsonl(self, path):
+        with open(path, encoding='utf-8') as file:
+            return [json.loads(line) for line in file]
+
+    def test_export_jsonl(self):
+        '''export_data выгружает посты в JSONL'''
+        rows = self.read_jsonl(self.export('posts', 'posts.jsonl'))
+        self.assertEqual(
+            [row['text'] for row in rows], [post.text for post in self.posts]
+        )
+        self.assertEqual(rows[0]['author'], 'author')
+        self.assertEqual(rows[0]['created'], self.posts[0].created.isoformat())
+
+    def test_export_csv_gzip(self):
+        '''export_data выгружает в сжатый CSV'''
+        path = self.export(
+            'comments', 'comments.csv.gz', file_format='csv', compress=True
+        )
+        with gzip.open(path, 'rt', encoding='utf-8', newline='') as file:
+            rows = list(csv.DictReader(file))
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(rows[0]['text'], 'Комментарий, с запятой')
+        self.assertEqual(rows[0]['author'], 'reader')
+
+        follows = self.read_jsonl(self.export('follows', 'follows.jsonl'))
+        self.assertEqual(
+            [(row['user'], row['author']) for row in follows],
+            [('reader', 'author')],
+        )
+
+    def test_watermark(self):
+        '''Повторная выгрузка с водяным знаком берет только новые строки'''
+        watermark = os.path.join(self.directory, 'watermark.json')
+        first = self.read_jsonl(
+            self.export('posts', 'first.jsonl', watermark=watermark)
+        )
+        self.assertEqual(len(first), len(self.posts))
+
+        post = Post.objects.create(author=self.author, text='Новый пост')
+        second = self.read_jsonl(
+            self.export('posts', 'second.jsonl', watermark=watermark)
+        )
+        self.assertEqual([row['id'] for row in second], [post.pk])
+
+        third = self.read_jsonl(
+            self.export('posts', 'third.jsonl', watermark=watermark)
+        )
+        self.assertEqual(third, [])
+
+    def test_watermark_late_old_row(self):
+        '''Строка, добавленная позже со старым created, не теряется'''
+        watermark = os.path.join(self.directory, 'watermark.json')
+        self.export('posts', 'first.jsonl', watermark=watermark)
+
+        post = Post.objects.create(author=self.author, text='Импорт')
+        Post.objects.filter(pk=post.pk).update(
+            created=self.posts[0].created - timedelta(days=1)
+        )
+        second = self.read_jsonl(
+            self.export('posts', 'second.jsonl', watermark=watermark)
+        )
+        self.assertEqual([row['id'] for row in second], [post.pk])
+
+    def test_watermark_follows(self):
+        '''Подписки без created тоже выгружаются инкрементально'''
+        watermark = os.path.join(self.directory, 'watermark.json')
+        self.export('follows', 'first.jsonl', watermark=watermark)
+        follow = Follow.objects.create(user=self.author, author=self.reader)
+        second = self.read_jsonl(
+            self.export('follows', 'second.jsonl', watermark=watermark)
+        )
+        self.assertEqual([row['id'] for row in second], [follow.pk])
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class SeedDataTest(TestCase):
+    OPTIONS = {
+        'users': 30,
+        'groups': 3,
+        'posts': 300,
+        'follows': 90,
+        'comments': 600,
+        'images': 2,
+        'image_share': 0.5,
+        'seed': 7,
+    }
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def seed(self):
+        call_command('seed_data', stdout=StringIO(), **self.OPTIONS)
+
+    def test_seed(self):
+        '''seed_data создает данные и пересчитывает счетчики и ленты'''
+        self.seed()
+        self.assertEqual(User.objects.count(), self.OPTIONS['users'])
+        self.assertEqual(Group.objects.count(), self.OPTIONS['groups'])
+        self.assertEqual(Post.objects.count(), self.OPTIONS['posts'])
+        self.assertTrue(Follow.objects.exists())
+        self.assertTrue(Comment.objects.exists())
+        self.assertFalse(Follow.objects.filter(user=F('author')).exists())
+        self.assertFalse(
+            Comment.objects.filter(created__lt=F('post__created')).exists()
+        )
+        self.assertTrue(Post.objects.exclude(image='').exists())
+
+        self.assertEqual(
+            UserStats.objects.aggregate(total=Sum('posts_count'))['total'],
+            self.OPTIONS['posts'],
+        )
+        self.assertEqual(
+            Post.objects.aggregate(total=Sum('comment_count'))['total'],
+            Comment.objects.count(),
+        )
+        follow = Follow.objects.first()
+        self.assertEqual(
+            TimelineEntry.objects.filter(user_id=follow.user_id).count(),
+            Post.objects.filter(
+                author__following__user_id=follow.user_id
+            ).count(),
+        )
+
+    def test_seed_twice(self):
+        '''Повторный запуск добавляет новых пользователей и группы'''
+        self.seed()
+        self.seed()
+        self.assertEqual(User.objects.count(), 2 * self.OPTIONS['users'])
+        self.assertEqual(Group.objects.count(), 2 * self.OPTIONS['groups'])
+        self.assertEqual(Post.objects.count(), 2 * self.OPTIONS['posts'])
+
+    def test_seed_deterministic(self):
+        '''Одно и то же зерно дает одни и те же данные'''
+        def snapshot():
+            return list(
+                Post.objects.order_by('pk').values_list(
+                    'author__username', 'group__slug', 'text', 'image'
+                )
+            )
+
+        self.seed()
+        first = snapshot()
+        User.objects.all().delete()
+        Group.objects.all().delete()
+        self.seed()
+        self.assertEqual(snapshot(), first)
@@ -0,0 +1,125 @@
+import json
+from http import HTTPStatus
+from xml.etree import ElementTree
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from .. import group_cache
+from ..models import Group, Post
+
+User = get_user_model()
+
+ATOM = '{http://www.w3.org/2005/Atom}'
+
+
+class FeedTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+
+        cls.author = User.objects.create_user(
+            username='author', first_name='Лев', last_name='Толстой'
+        )
+        cls.other = User.objects.create_user(username='other')
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание группы'
+        )
+        cls.post = Post.objects.create(
+            author=cls.author, group=cls.group, text='Пост автора в группе'
+        )
+        cls.other_post = Post.objects.create(
+            author=cls.other, text='Пост без группы'
+        )
+
+        cls.FEED = reverse('posts:feed', args=('rss',))
+        cls.GROUP_FEED = reverse(
+            'posts:group_feed', args=(cls.group.slug, 'atom')
+        )
+        cls.PROFILE_FEED = reverse(
+            'posts:profile_feed', args=(cls.author.username, 'json')
+        )
+
+    def setUp(self):
+        cache.clear()
+        group_cache.clear()
+
+    def read(self, url):
+        response = self.client.get(url)
+        if response.streaming:
+            return b''.join(response.streaming_content)
+        return response.content
+
+    def test_feed_formats(self):
+        '''Ленты отдаются в RSS, Atom и JSON Feed'''
+        rss = ElementTree.fromstring(self.read(self.FEED))
+        self.assertEqual(
+            [item.findtext('title') for item in rss.iter('item')],
+            [self.other_post.text, self.post.text],
+        )
+
+        atom = ElementTree.fromstring(self.read(self.GROUP_FEED))
+        self.assertEqual(
+            [entry.findtext(f'{ATOM}title') for entry in atom.iter(
+                f'{ATOM}entry'
+            )],
+            [self.post.text],
+        )
+
+        response = self.client.get(self.PROFILE_FEED)
+        self.assertEqual(
+            response['Content-Type'], 'application/feed+json; charset=utf-8'
+        )
+        feed = json.loads(b''.join(response.streaming_content))
+        self.assertEqual(feed['title'], 'Yatube: Лев Толстой')
+        self.assertEqual(len(feed['items']), 1)
+        item = feed['items'][0]
+        self.assertEqual(item['content_text'], self.post.text)
+        self.assertEqual(item['tags'], [self.group.title])
+        self.assertEqual(item['authors'][0]['name'], 'Лев Толстой')
+
+    def test_unknown_feed(self):
+        '''Неизвестные формат, группа и автор дают 404'''
+        urls = (
+            reverse('posts:feed', args=('xml',)),
+            reverse('posts:group_feed', args=('missing', 'rss')),
+            reverse('posts:profile_feed', args=('missing', 'rss')),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                self.assertEqual(
+                    self.client.get(url).status_code, HTTPStatus.NOT_FOUND
+                )
+
+    @override_settings(SYNDICATION_ITEMS=1)
+    def test_feed_length(self):
+        '''В ленте не больше SYNDICATION_ITEMS записей'''
+        feed = json.loads(self.read(reverse('posts:feed', args=('json',))))
+        self.assertEqual(len(feed['items']), settings.SYNDICATION_ITEMS)
+
+    def test_feed_cached(self):
+        '''Лента кэшируется и сбрасывается новым постом'''
+        response = self.client.get(self.FEED)
+        self.assertTrue(response.streaming)
+        content = b''.join(response.streaming_content)
+
+        with self.assertNumQueries(0):
+            response = self.client.get(self.FEED)
+        self.assertFalse(response.streaming)
+        self.assertEqual(response.content, content)
+
+        Post.objects.create(author=self.author, text='Новый пост')
+        self.assertIn('Новый пост', self.read(self.FEED).decode())
+
+    def test_feed_not_modified(self):
+        '''Ленты поддерживают условные запросы'''
+        etag = self.client.get(self.FEED)['ETag']
+        response = self.client.get(self.FEED, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
+
+        Post.objects.create(author=self.author, text='Новый пост')
+        response = self.client.get(self.FEED, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
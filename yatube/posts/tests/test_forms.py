@@ -1,3 +1,5 @@
+import hashlib
+import os
 import shutil
 import tempfile
 
@@ -7,6 +9,7 @@ from django.core.files.uploadedfile import SimpleUploadedFile
 from django.test import Client, TestCase, override_settings
 from django.urls import reverse
 
+from .. import thumbnails
 from ..models import Comment, Post
 
 User = get_user_model()
@@ -92,7 +95,86 @@ class FormsPostsTest(FormsTest):
         self.assertEqual(new_post_from_db.text, new_post['text'])
         self.assertIsNone(new_post_from_db.group)
         self.assertEqual(new_post_from_db.author, self.user)
-        self.assertEqual(new_post_from_db.image, f"posts/{new_post['image']}")
+        digest = hashlib.sha256(bytes_image).hexdigest()
+        self.assertEqual(
+            new_post_from_db.image,
+            f'posts/{digest[:2]}/{digest[2:4]}/{digest}.gif',
+        )
+
+    def test_duplicate_image_stored_once(self):
+        '''Одинаковые картинки хранятся одним файлом'''
+        first = self.upload_post('duplicate_1.gif')
+        second = self.upload_post('duplicate_2.GIF')
+        self.assertNotEqual(first, second)
+        self.assertEqual(first.image.name, second.image.name)
+        self.assertEqual(
+            os.listdir(os.path.dirname(first.image.path)),
+            [os.path.basename(first.image.name)],
+        )
+
+    def upload_post(self, name, color=b'\xFF\xFF\xFF'):
+        image = SimpleUploadedFile(
+            name=name,
+            content=(
+                b'\x47\x49\x46\x38\x39\x61\x02\x00'
+                b'\x01\x00\x80\x00\x00\x00\x00\x00'
+                + color + b'\x21\xF9\x04\x00\x00'
+                b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+                b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+                b'\x0A\x00\x3B'
+            ),
+            content_type='image/gif',
+        )
+        self.authorized_client.post(
+            self.POST_CREATE,
+            data={'text': 'Пост с картинкой', 'image': image},
+        )
+        return self.user.posts.first()
+
+    @override_settings(THUMBNAIL_WORKERS=0)
+    def test_thumbnails_generated_on_create(self):
+        '''Все варианты картинки создаются сразу после сохранения поста'''
+        post = self.upload_post('thumbnail_inline.gif')
+        ready = thumbnails.ready(post.image, 'card')
+        self.assertIsNotNone(ready)
+        self.assertEqual(
+            {
+                (rendition.format, thumbnail.width, thumbnail.height)
+                for rendition, thumbnail in ready
+            },
+            {
+                (image_format, width, height)
+                for image_format in ('WEBP', 'JPEG')
+                for width, height in ((480, 170), (960, 339), (1440, 508))
+            },
+        )
+
+        urls = (
+            reverse('posts:post_detail', kwargs={'post_id': post.pk}),
+            self.POST_PROFILE,
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.guest_client.get(url)
+                for rendition, thumbnail in ready:
+                    self.assertContains(
+                        response, f'{thumbnail.url} {thumbnail.width}w'
+                    )
+                self.assertContains(response, 'type="image/webp"')
+                for attribute in ('width="960"', 'height="339"', 'lazy'):
+                    self.assertContains(response, attribute)
+
+    @override_settings(THUMBNAIL_WORKERS=2)
+    def test_original_shown_until_thumbnail_ready(self):
+        '''Пока миниатюра не готова, показывается оригинал'''
+        post = self.upload_post('thumbnail_pool.gif', color=b'\x00\xFF\x00')
+        # Пул запускается после коммита, которого в TestCase не бывает.
+        self.assertIsNone(thumbnails.ready(post.image, 'card'))
+
+        response = self.guest_client.get(
+            reverse('posts:post_detail', kwargs={'post_id': post.pk})
+        )
+        self.assertContains(response, f'src="{post.image.url}"')
 
     def test_edit_post(self):
         '''Проверка редактирования поста'''
@@ -4,7 +4,7 @@ from string import ascii_letters
 from django.contrib.auth import get_user_model
 from django.test import TestCase
 
-from ..models import Group, Post
+from ..models import Comment, Follow, Group, Post, UserStats
 
 User = get_user_model()
 
@@ -103,3 +103,40 @@ class GroupModelTest(TestCase):
         '''Проверка корректной работы __str__ модели Group'''
         group_title = str(self.group)
         self.assertEqual(group_title, self.GROUP_TITLE)
+
+
+class UserStatsTest(TestCase):
+    def setUp(self):
+        self.author = User.objects.create_user(username='author')
+        self.follower = User.objects.create_user(username='follower')
+
+    def get_stats(self, user):
+        return UserStats.objects.get(user=user)
+
+    def test_post_counters(self):
+        '''Счетчики постов и комментариев следуют за записью и удалением'''
+        post = Post.objects.create(author=self.author, text='Пост')
+        self.assertEqual(self.get_stats(self.author).posts_count, 1)
+
+        comment = Comment.objects.create(
+            post=post, author=self.follower, text='Комментарий'
+        )
+        post.refresh_from_db()
+        self.assertEqual(post.comment_count, 1)
+
+        comment.delete()
+        post.refresh_from_db()
+        self.assertEqual(post.comment_count, 0)
+
+        post.delete()
+        self.assertEqual(self.get_stats(self.author).posts_count, 0)
+
+    def test_follow_counters(self):
+        '''Счетчики подписок следуют за подпиской и отпиской'''
+        follow = Follow.objects.create(user=self.follower, author=self.author)
+        self.assertEqual(self.get_stats(self.author).followers_count, 1)
+        self.assertEqual(self.get_stats(self.follower).following_count, 1)
+
+        follow.delete()
+        self.assertEqual(self.get_stats(self.author).followers_count, 0)
+        self.assertEqual(self.get_stats(self.follower).following_count, 0)
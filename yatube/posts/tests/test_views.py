@@ -1,16 +1,24 @@
+import re
 import shutil
 import tempfile
+from http import HTTPStatus
 from math import ceil
+from unittest import mock, skipUnless
 
 from django import forms
 from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.core.cache import cache
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
 from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
-from ..models import Follow, Group, Post
+from .. import autocomplete, feed_cache, group_cache, thumbnails
+from ..models import Comment, Follow, Group, Post, TimelineEntry
+from ..paginators import MergedCursorPaginator
+from ..views import Index
 
 User = get_user_model()
 
@@ -43,6 +51,8 @@ class ViewTest(TestCase):
     def setUp(self):
         self.authorized_client = Client()
         self.authorized_client.force_login(self.user)
+        cache.clear()
+        group_cache.clear()
 
 
 @override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
@@ -216,26 +226,57 @@ class PostViewTest(ViewTest):
 
     def test_index_cache(self):
         '''Проверка кэширования главной страницы'''
-        post_count = Post.objects.count()
         post = Post.objects.create(
             author=self.user,
             text='проверка кэша'
         )
-        self.assertEqual(Post.objects.count(), post_count + 1)
         response = self.guest_client.get(self.INDEX)
 
-        post.delete()
-        self.assertEqual(Post.objects.count(), post_count)
+        Post.objects.filter(pk=post.pk).update(text='обход сигналов')
+        response_cached = self.guest_client.get(self.INDEX)
+        self.assertEqual(response.content, response_cached.content)
 
+        post.delete()
         response_after_delete = self.guest_client.get(self.INDEX)
-        self.assertEqual(response.content, response_after_delete.content)
+        self.assertNotContains(response_after_delete, 'проверка кэша')
 
-        cache.clear()
+    def test_index_cache_invalidated(self):
+        '''Кэш главной страницы сбрасывается при изменении ленты'''
+        post = Post.objects.create(
+            author=self.user,
+            text='проверка кэша',
+            group=self.group,
+        )
+        changes = {
+            'пост': lambda: Post.objects.create(
+                author=self.user, text='новый пост'
+            ),
+            'группа': lambda: Group.objects.get(pk=self.group.pk).save(),
+            'автор': lambda: User.objects.get(pk=self.user.pk).save(
+                update_fields=['first_name']
+            ),
+            'комментарий': lambda: Comment.objects.create(
+                post=post, author=self.user, text='комментарий'
+            ),
+        }
+        for change, make_change in changes.items():
+            with self.subTest(change=change):
+                key = self.guest_client.get(self.INDEX).context[
+                    'feed_cache_key'
+                ]
+                make_change()
+                self.assertNotEqual(
+                    self.guest_client.get(self.INDEX).context[
+                        'feed_cache_key'
+                    ],
+                    key,
+                )
 
-        response_after_cache_clear = self.guest_client.get(self.INDEX)
-        self.assertNotEqual(
-            response.content,
-            response_after_cache_clear.content,
+        key = self.guest_client.get(self.INDEX).context['feed_cache_key']
+        User.objects.get(pk=self.user.pk).save(update_fields=['last_login'])
+        self.assertEqual(
+            self.guest_client.get(self.INDEX).context['feed_cache_key'],
+            key,
         )
 
 
@@ -305,6 +346,778 @@ class PaginatorTest(ViewTest):
                         )
                     )
 
+    def test_index_pages_cached_separately(self):
+        '''Каждая страница главной кэшируется отдельно'''
+        self.client.get(self.INDEX)
+        response = self.client.get(self.INDEX, {'page': 2})
+        for post in response.context[self.CONTEXT]:
+            self.assertContains(response, post.text)
+
+
+class CursorPaginatorTest(ViewTest):
+    POST_COUNT = settings.OBJECTS_PER_PAGE + 5
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        Post.objects.bulk_create(
+            Post(
+                author=cls.user,
+                text=f'Пост для тестов №{i + 1}',
+                group=cls.group,
+            )
+            for i in range(cls.POST_COUNT)
+        )
+
+    def get_page(self, url, **params):
+        response = self.authorized_client.get(url, params)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        return response.context[self.CONTEXT]
+
+    def test_cursor_pages(self):
+        '''Курсорная пагинация проходит ленту без пропусков и повторов'''
+        urls = [
+            self.INDEX,
+            self.GROUP_LIST,
+            self.PROFILE,
+        ]
+        expected = list(
+            Post.objects.order_by('-created', '-id').values_list(
+                'id', flat=True
+            )
+        )
+
+        for url in urls:
+            with self.subTest(url=url):
+                first_page = self.get_page(url)
+                self.assertTrue(first_page.has_next())
+
+                second_page = self.get_page(
+                    url, after=first_page.next_cursor
+                )
+                self.assertTrue(second_page.has_previous())
+                self.assertFalse(second_page.has_next())
+                self.assertEqual(
+                    [post.id for post in first_page]
+                    + [post.id for post in second_page],
+                    expected,
+                )
+
+                previous_page = self.get_page(
+                    url, before=second_page.previous_cursor
+                )
+                self.assertFalse(previous_page.has_previous())
+                self.assertEqual(
+                    [post.id for post in previous_page],
+                    [post.id for post in first_page],
+                )
+
+    def test_cursor_page_without_count(self):
+        '''Курсорная страница не выполняет COUNT(*)'''
+        cursor = self.get_page(self.INDEX).next_cursor
+        with CaptureQueriesContext(connection) as queries:
+            self.authorized_client.get(self.INDEX, {'after': cursor})
+        self.assertFalse(
+            [query for query in queries if 'COUNT(' in query['sql']]
+        )
+
+    def test_invalid_cursor(self):
+        '''Некорректный курсор возвращает 404'''
+        response = self.authorized_client.get(self.INDEX, {'after': '!!!'})
+        self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+
+
+class CommentPaginationTest(ViewTest):
+    COMMENT_COUNT = settings.COMMENTS_PER_PAGE + 5
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.post = Post.objects.create(
+            author=cls.user,
+            text='Пост с комментариями',
+        )
+        Comment.objects.bulk_create(
+            Comment(
+                post=cls.post,
+                author=User.objects.create_user(username=f'commentator_{i}'),
+                text=f'Комментарий №{i + 1}',
+            )
+            for i in range(cls.COMMENT_COUNT)
+        )
+        cls.POST_DETAIL = reverse(
+            'posts:post_detail', kwargs={'post_id': cls.post.pk}
+        )
+        cls.POST_COMMENTS = reverse(
+            'posts:post_comments', kwargs={'post_id': cls.post.pk}
+        )
+
+    def setUp(self):
+        super().setUp()
+        self.guest_client = Client()
+
+    def test_comment_pages(self):
+        '''Комментарии подгружаются страницами без пропусков и повторов'''
+        expected = list(
+            self.post.comments.order_by('-created', '-id').values_list(
+                'id', flat=True
+            )
+        )
+
+        with self.assertNumQueries(2):
+            response = self.guest_client.get(self.POST_DETAIL)
+        first_page = response.context['comments_page']
+        self.assertEqual(len(first_page), settings.COMMENTS_PER_PAGE)
+        self.assertContains(response, first_page.next_cursor)
+
+        with self.assertNumQueries(1):
+            response = self.guest_client.get(
+                self.POST_COMMENTS, {'after': first_page.next_cursor}
+            )
+        self.assertTemplateUsed(response, 'posts/includes/comment_list.html')
+        second_page = response.context['comments_page']
+        self.assertFalse(second_page.has_next())
+        self.assertEqual(
+            [comment.id for comment in first_page]
+            + [comment.id for comment in second_page],
+            expected,
+        )
+
+    def test_comment_fragment(self):
+        '''Фрагмент комментариев отдается без обвязки страницы'''
+        response = self.guest_client.get(self.POST_COMMENTS)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertNotContains(response, '<html')
+        self.assertContains(response, 'js-more-comments')
+
+    def test_comment_invalid_cursor(self):
+        '''Некорректный курсор комментариев возвращает 404'''
+        response = self.guest_client.get(self.POST_COMMENTS, {'after': '!!!'})
+        self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+
+
+class GroupCacheTest(ViewTest):
+    def setUp(self):
+        super().setUp()
+        self.guest_client = Client()
+
+    def group_queries(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.guest_client.get(self.GROUP_LIST)
+        self.assertEqual(response.context['group'].pk, self.group.pk)
+        return [
+            query for query in queries
+            if query['sql'].startswith('SELECT')
+            and 'FROM "posts_group"' in query['sql']
+        ]
+
+    def test_group_cached(self):
+        '''Группа читается из памяти процесса после первого запроса'''
+        self.assertTrue(self.group_queries())
+        self.assertFalse(self.group_queries())
+
+    def test_group_cache_invalidated(self):
+        '''Изменение группы сбрасывает кэш'''
+        self.group_queries()
+        group = Group.objects.get(pk=self.group.pk)
+        group.title = 'Новое название'
+        group.save()
+        self.assertTrue(self.group_queries())
+        self.assertContains(
+            self.guest_client.get(self.GROUP_LIST), 'Новое название'
+        )
+
+        slug = group.slug
+        group.delete()
+        self.assertIsNone(group_cache.get_by_slug(slug))
+
+
+@skipUnless(connection.vendor == 'sqlite', 'FTS5 из SQLite')
+class SearchTest(ViewTest):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.SEARCH = reverse('posts:search')
+
+    def search(self, query, **params):
+        response = self.client.get(self.SEARCH, {'q': query, **params})
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        return response
+
+    def test_search_ranked(self):
+        '''Поиск находит посты и ставит более релевантные выше'''
+        Post.objects.create(author=self.user, text='Кошки и собаки')
+        best = Post.objects.create(
+            author=self.user, text='Кошки, кошки, кошки <b>везде</b>'
+        )
+        Post.objects.create(author=self.user, text='Только собаки')
+
+        response = self.search('КОШКИ')
+        posts = list(response.context[self.CONTEXT])
+        self.assertEqual(len(posts), 2)
+        self.assertEqual(posts[0], best)
+        self.assertIn('<mark>Кошки</mark>', posts[0].snippet)
+        self.assertIn('&lt;b&gt;', posts[0].snippet)
+
+        self.assertEqual(
+            len(self.search('кош').context[self.CONTEXT]), 2
+        )
+        self.assertFalse(self.search('"OR*').context[self.CONTEXT])
+
+    def test_search_index_follows_posts(self):
+        '''Индекс обновляется при изменении и удалении постов'''
+        post = Post.objects.create(author=self.user, text='старый текст')
+        post.text = 'новый текст'
+        post.save()
+        self.assertFalse(self.search('старый').context[self.CONTEXT])
+        self.assertTrue(self.search('новый').context[self.CONTEXT])
+
+        post.delete()
+        self.assertFalse(self.search('новый').context[self.CONTEXT])
+
+    def test_search_paginated(self):
+        '''Результаты поиска разбиты на страницы'''
+        Post.objects.bulk_create(
+            Post(author=self.user, text=f'Поисковый пост {i}')
+            for i in range(settings.OBJECTS_PER_PAGE + 3)
+        )
+        first_page = self.search('поисковый').context[self.CONTEXT]
+        second_page = self.search('поисковый', page=2).context[self.CONTEXT]
+        self.assertEqual(len(first_page), settings.OBJECTS_PER_PAGE)
+        self.assertEqual(len(second_page), 3)
+        self.assertFalse(
+            {post.pk for post in first_page}
+            & {post.pk for post in second_page}
+        )
+
+
+class SuggestTest(ViewTest):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.SUGGEST = reverse('posts:suggest')
+        cls.writer = User.objects.create_user(
+            username='tolstoy', first_name='Лев', last_name='Толстой'
+        )
+
+    def setUp(self):
+        super().setUp()
+        autocomplete.clear()
+
+    def suggest(self, query):
+        response = self.client.get(self.SUGGEST, {'q': query})
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        return response.json()['results']
+
+    def test_suggest(self):
+        '''Подсказки ищутся по началу логина, имени, фамилии и группы'''
+        profile = reverse(
+            'posts:profile', kwargs={'username': self.writer.username}
+        )
+        for query in ('tol', 'ЛЕВ', 'толст', 'лев  толстой'):
+            with self.subTest(query=query):
+                self.assertEqual(self.suggest(query), [{
+                    'type': 'user',
+                    'username': 'tolstoy',
+                    'full_name': 'Лев Толстой',
+                    'url': profile,
+                }])
+        self.assertEqual(self.suggest('для т'), [{
+            'type': 'group',
+            'title': self.group.title,
+            'slug': self.group.slug,
+            'url': self.GROUP_LIST,
+        }])
+        self.assertEqual(self.suggest(''), [])
+        self.assertEqual(self.suggest('достоевский'), [])
+
+    def test_suggest_without_queries(self):
+        '''Подсказки отдаются из памяти без запросов к БД'''
+        self.suggest('tol')
+        with self.assertNumQueries(0):
+            self.suggest('лев')
+
+    def test_suggest_follows_changes(self):
+        '''Индекс подсказок обновляется при изменении пользователей и групп'''
+        self.suggest('tol')
+
+        writer = User.objects.get(pk=self.writer.pk)
+        writer.last_name = 'Николаевич'
+        writer.save()
+        group = Group.objects.create(title='Классика', slug='classics')
+        with self.assertNumQueries(0):
+            self.assertFalse(self.suggest('толст'))
+            self.assertTrue(self.suggest('никол'))
+            self.assertTrue(self.suggest('класс'))
+
+        writer.delete()
+        group.delete()
+        with self.assertNumQueries(0):
+            self.assertFalse(self.suggest('лев'))
+            self.assertFalse(self.suggest('класс'))
+
+    def test_changes_during_build_kept(self):
+        '''Изменения во время перестроения индекса не теряются'''
+        build = autocomplete.build
+
+        def build_and_change():
+            index = build()
+            User.objects.create_user(username='pushkin')
+            return index
+
+        with mock.patch.object(autocomplete, 'build', build_and_change):
+            self.assertTrue(self.suggest('tol'))
+        self.assertTrue(self.suggest('push'))
+
+    def test_stale_index_served_while_rebuilt(self):
+        '''Устаревший индекс отвечает, пока новый строится в фоне'''
+        self.suggest('tol')
+        autocomplete._expires = 0
+        with mock.patch.object(autocomplete.threading, 'Thread') as thread:
+            with self.assertNumQueries(0):
+                self.assertTrue(self.suggest('tol'))
+                self.assertTrue(self.suggest('лев'))
+        thread.assert_called_once()
+        thread.return_value.start.assert_called_once_with()
+        autocomplete.clear()
+
+
+@override_settings(THUMBNAIL_WORKERS=2)
+class ThumbnailPrefetchTest(ViewTest):
+    POST_COUNT = settings.OBJECTS_PER_PAGE
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        Post.objects.bulk_create(
+            Post(
+                author=cls.user,
+                text=f'Пост с картинкой №{i + 1}',
+                image=f'posts/prefetch_{i}.gif',
+            )
+            for i in range(cls.POST_COUNT)
+        )
+
+    def kvstore_queries(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.INDEX)
+        for post in response.context[self.CONTEXT]:
+            self.assertIn('card', post.prefetched_thumbnails)
+        return [
+            query for query in queries
+            if 'thumbnail_kvstore' in query['sql']
+        ]
+
+    def test_thumbnails_prefetched(self):
+        '''Миниатюры страницы ищутся одним запросом, затем в кэше'''
+        self.assertEqual(len(self.kvstore_queries()), 1)
+        self.assertEqual(len(self.kvstore_queries()), 0)
+
+
+class ConditionalGetTest(ViewTest):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='reader')
+        cls.post = Post.objects.create(
+            author=cls.user, group=cls.group, text='Пост для ETag'
+        )
+        cls.POST_DETAIL = reverse(
+            'posts:post_detail', kwargs={'post_id': cls.post.pk}
+        )
+        cls.FOLLOW_INDEX = reverse('posts:follow_index')
+
+    def setUp(self):
+        super().setUp()
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def revisit(self, client, url):
+        # The first visit to a page with a form sets the CSRF cookie.
+        client.get(url)
+        etag = client.get(url)['ETag']
+        return client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+    def test_not_modified(self):
+        '''Повторный запрос без изменений получает 304'''
+        for url in (
+            self.INDEX, self.GROUP_LIST, self.PROFILE, self.POST_DETAIL,
+        ):
+            with self.subTest(url=url):
+                response = self.revisit(self.authorized_client, url)
+                self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
+                self.assertFalse(response.content)
+        response = self.revisit(self.reader_client, self.FOLLOW_INDEX)
+        self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
+
+    def test_etag_depends_on_viewer(self):
+        '''У разных пользователей разные ETag'''
+        etag = self.authorized_client.get(self.INDEX)['ETag']
+        self.assertNotEqual(self.client.get(self.INDEX)['ETag'], etag)
+        self.assertNotEqual(self.reader_client.get(self.INDEX)['ETag'], etag)
+
+    def test_etag_changes_with_content(self):
+        '''Новый пост или подписка меняют ETag'''
+        urls = (self.INDEX, self.GROUP_LIST, self.PROFILE)
+        etags = {
+            url: self.authorized_client.get(url)['ETag'] for url in urls
+        }
+        Post.objects.create(author=self.user, group=self.group, text='Ещё')
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.authorized_client.get(
+                    url, HTTP_IF_NONE_MATCH=etags[url]
+                )
+                self.assertEqual(response.status_code, HTTPStatus.OK)
+
+        etags = {
+            url: self.reader_client.get(url)['ETag']
+            for url in (self.PROFILE, self.FOLLOW_INDEX)
+        }
+        Follow.objects.create(user=self.reader, author=self.user)
+        for url, etag in etags.items():
+            with self.subTest(url=url):
+                response = self.reader_client.get(
+                    url, HTTP_IF_NONE_MATCH=etag
+                )
+                self.assertEqual(response.status_code, HTTPStatus.OK)
+
+    def test_etag_kept_for_unrelated_changes(self):
+        '''Пост и комментарий в другом месте не меняют ETag страницы'''
+        other_group = Group.objects.create(title='Другая', slug='other')
+        other_post = Post.objects.create(
+            author=self.reader, group=other_group, text='Чужой пост'
+        )
+        urls = (self.GROUP_LIST, self.PROFILE, self.POST_DETAIL)
+        for url in urls:
+            self.authorized_client.get(url)
+        etags = {
+            url: self.authorized_client.get(url)['ETag'] for url in urls
+        }
+        index_etag = self.authorized_client.get(self.INDEX)['ETag']
+        Post.objects.create(
+            author=self.reader, group=other_group, text='Еще чужой'
+        )
+        Comment.objects.create(
+            post=other_post, author=self.reader, text='Комментарий'
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.authorized_client.get(
+                    url, HTTP_IF_NONE_MATCH=etags[url]
+                )
+                self.assertEqual(
+                    response.status_code, HTTPStatus.NOT_MODIFIED
+                )
+        response = self.authorized_client.get(
+            self.INDEX, HTTP_IF_NONE_MATCH=index_etag
+        )
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+
+        Comment.objects.create(
+            post=self.post, author=self.reader, text='Комментарий'
+        )
+        response = self.authorized_client.get(
+            self.POST_DETAIL, HTTP_IF_NONE_MATCH=etags[self.POST_DETAIL]
+        )
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+
+
+class ThumbnailFailureTest(ViewTest):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.post = Post.objects.create(
+            author=cls.user, text='Пост', image='posts/missing.jpg'
+        )
+
+    def test_failed_source_not_rescheduled(self):
+        '''Битая картинка не создается заново при каждом просмотре'''
+        with mock.patch.object(
+            thumbnails, 'generate', wraps=thumbnails.generate
+        ) as generate:
+            for _ in range(3):
+                self.client.get(self.INDEX)
+        generate.assert_called_once_with(self.post.image.name)
+
+    def test_failed_job_keeps_generation(self):
+        '''Неудачная задача не сбрасывает кэш страниц'''
+        generation = feed_cache.generation()
+        # Закрытие соединения оборвало бы транзакцию теста.
+        with mock.patch.object(thumbnails, 'close_old_connections'):
+            thumbnails._run(self.post.image.name)
+        self.assertEqual(feed_cache.generation(), generation)
+
+    def test_finished_job_bumps_scheduled_post(self):
+        '''Готовые миниатюры сбрасывают кэш страниц своего поста'''
+        name = self.post.image.name
+        generation = feed_cache.post_generation(self.post.pk)
+        thumbnails._pending[name] = {thumbnails.post_pages(self.post.image)}
+        with mock.patch.object(thumbnails, 'generate', return_value=True), \
+                mock.patch.object(thumbnails, 'close_old_connections'), \
+                self.assertNumQueries(0):
+            thumbnails._run(name)
+        self.assertNotEqual(
+            feed_cache.post_generation(self.post.pk), generation
+        )
+        self.assertNotIn(name, thumbnails._pending)
+
+
+class CountCacheTest(ViewTest):
+    POST_COUNT = settings.OBJECTS_PER_PAGE + 5
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        Post.objects.bulk_create(
+            Post(
+                author=cls.user,
+                text=f'Пост для тестов №{i + 1}',
+                group=cls.group,
+            )
+            for i in range(cls.POST_COUNT)
+        )
+
+    def get_paginator(self, url):
+        response = self.authorized_client.get(url, {'page': 1})
+        return response.context[self.CONTEXT].paginator
+
+    def test_count_cached(self):
+        '''Количество постов в ленте берется из кэша'''
+        self.assertEqual(self.get_paginator(self.INDEX).count, self.POST_COUNT)
+        with CaptureQueriesContext(connection) as queries:
+            paginator = self.get_paginator(self.INDEX)
+            self.assertEqual(paginator.count, self.POST_COUNT)
+        self.assertFalse(
+            [query for query in queries if 'COUNT(' in query['sql']]
+        )
+
+    def test_count_invalidated(self):
+        '''Кэш количества постов сбрасывается при создании и удалении'''
+        urls = [
+            self.INDEX,
+            self.GROUP_LIST,
+            self.PROFILE,
+        ]
+        for url in urls:
+            self.get_paginator(url).count
+
+        post = Post.objects.create(
+            author=self.user,
+            text='Новый пост',
+            group=self.group,
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                self.assertEqual(
+                    self.get_paginator(url).count, self.POST_COUNT + 1
+                )
+
+        post.delete()
+        for url in urls:
+            with self.subTest(url=url):
+                self.assertEqual(
+                    self.get_paginator(url).count, self.POST_COUNT
+                )
+
+    def test_count_invalidated_for_previous_group(self):
+        '''Перенос поста в другую группу сбрасывает кэш прежней группы'''
+        self.assertEqual(
+            self.get_paginator(self.GROUP_LIST).count, self.POST_COUNT
+        )
+        post = Post.objects.filter(group=self.group).first()
+        post.group = Group.objects.create(title='Новая', slug='new')
+        post.save()
+        self.assertEqual(
+            self.get_paginator(self.GROUP_LIST).count, self.POST_COUNT - 1
+        )
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=0)
+    def test_follow_count_follows_pulled_authors(self):
+        '''Кэш ленты подписок учитывает посты популярных авторов'''
+        follower = User.objects.create_user(username='count_follower')
+        Follow.objects.create(user=follower, author=self.user)
+        cache.clear()
+        client = Client()
+        client.force_login(follower)
+        url = reverse('posts:follow_index')
+
+        def count():
+            response = client.get(url, {'page': 1})
+            return response.context[self.CONTEXT].paginator.count
+
+        self.assertEqual(count(), self.POST_COUNT)
+        post = Post.objects.create(author=self.user, text='Новый пост')
+        self.assertEqual(count(), self.POST_COUNT + 1)
+        post.delete()
+        self.assertEqual(count(), self.POST_COUNT)
+
+    @override_settings(FEED_COUNT_ESTIMATE_THRESHOLD=5)
+    def test_estimated_count(self):
+        '''Выше порога количество постов оценивается'''
+        paginator = self.get_paginator(self.INDEX)
+        self.assertEqual(paginator.count, 5)
+        self.assertTrue(paginator.estimated)
+
+    @override_settings(FEED_COUNT_ESTIMATE_THRESHOLD=12)
+    def test_estimated_count_links(self):
+        '''При оценке количества нет ссылки на последнюю страницу'''
+        with mock.patch.object(Index, 'paginate_by', 1):
+            response = self.authorized_client.get(self.INDEX, {'page': 6})
+        self.assertTrue(response.context[self.CONTEXT].paginator.estimated)
+        self.assertNotContains(response, 'Последняя')
+        for number in range(1, 13):
+            with self.subTest(number=number):
+                self.assertEqual(
+                    f'?page={number}"' in response.content.decode(),
+                    number == 1 or (3 <= number <= 9 and number != 6),
+                )
+
+
+class QueryCountTest(ViewTest):
+    POST_COUNT = settings.OBJECTS_PER_PAGE + 5
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+
+        posts = list()
+        authors = list()
+        for i in range(cls.POST_COUNT):
+            author = User.objects.create_user(
+                username=f'author_{i}',
+                first_name='Имя',
+                last_name=f'Фамилия {i}',
+            )
+            authors.append(author)
+            posts.append(Post(
+                author=author,
+                text=f'Пост для подсчета запросов №{i + 1}',
+                group=cls.group,
+            ))
+        posts.append(Post(
+            author=cls.user,
+            text='Пост автора профиля',
+            group=cls.group,
+        ))
+        Post.objects.bulk_create(posts)
+        for author in authors:
+            Follow.objects.create(user=cls.user, author=author)
+
+        cls.FOLLOW_INDEX = reverse('posts:follow_index')
+
+    def setUp(self):
+        super().setUp()
+        self.guest_client = Client()
+        cache.clear()
+
+    def test_feed_queries_do_not_depend_on_page_size(self):
+        '''Ленты выполняют фиксированное число запросов к БД'''
+        urls_queries = {
+            self.INDEX: (self.guest_client, 2),
+            self.GROUP_LIST: (self.guest_client, 3),
+            self.PROFILE: (self.guest_client, 3),
+            self.FOLLOW_INDEX: (self.authorized_client, 5),
+        }
+
+        for url, (client, queries) in urls_queries.items():
+            with self.subTest(url=url):
+                with self.assertNumQueries(queries):
+                    response = client.get(url)
+                self.assertTrue(response.context[self.CONTEXT])
+
+    def test_profile_header_single_query(self):
+        '''Автор, его статистика и подписка читаются одним запросом'''
+        author = User.objects.get(username='author_0')
+        profile = reverse(
+            'posts:profile', kwargs={'username': author.username}
+        )
+        self.guest_client.get(profile)
+
+        # Гостю: автор и посты; пользователю еще сессия и он сам.
+        clients_queries = {
+            self.guest_client: (2, False),
+            self.authorized_client: (4, True),
+        }
+        for client, (queries, following) in clients_queries.items():
+            with self.subTest(following=following):
+                with self.assertNumQueries(queries):
+                    response = client.get(profile)
+                self.assertEqual(response.context['following'], following)
+
+
+@skipUnless(connection.vendor == 'sqlite', 'EXPLAIN QUERY PLAN из SQLite')
+class QueryPlanTest(ViewTest):
+    FULL_SCAN = re.compile(r'\bSCAN (TABLE )?\w+$')
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+
+        cls.author = User.objects.create_user(username='author')
+        Post.objects.bulk_create(
+            Post(
+                author=(cls.user, cls.author)[i % 2],
+                text=f'Пост для тестов №{i + 1}',
+                group=cls.group,
+            )
+            for i in range(
+                settings.OBJECTS_PER_PAGE
+                * (MergedCursorPaginator.merged_pages + 1)
+                * 2
+            )
+        )
+        Follow.objects.create(user=cls.user, author=cls.author)
+        cls.post = Post.objects.create(author=cls.author, text='Пост')
+        Comment.objects.create(post=cls.post, author=cls.user, text='Да')
+
+        cls.FOLLOW_INDEX = reverse('posts:follow_index')
+        cls.POST_DETAIL = reverse(
+            'posts:post_detail', kwargs={'post_id': cls.post.pk}
+        )
+
+    def get_plans(self, url, **params):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.authorized_client.get(url, params)
+        self.assertEqual(response.status_code, HTTPStatus.OK, (url, params))
+        plans = dict()
+        with connection.cursor() as cursor:
+            for query in queries:
+                if not query['sql'].startswith('SELECT'):
+                    continue
+                cursor.execute('EXPLAIN QUERY PLAN ' + query['sql'])
+                plans[query['sql']] = [row[-1] for row in cursor.fetchall()]
+        return response, plans
+
+    def test_feed_queries_use_indexes(self):
+        '''Запросы страниц не сканируют таблицы и не сортируют'''
+        urls = [
+            self.INDEX,
+            self.GROUP_LIST,
+            self.PROFILE,
+            self.FOLLOW_INDEX,
+            self.POST_DETAIL,
+        ]
+        for url in urls:
+            response, _ = self.get_plans(url)
+            requests = [
+                dict(),
+                dict(page=2),
+                dict(page=MergedCursorPaginator.merged_pages + 1),
+            ]
+            cursor = getattr(
+                response.context.get(self.CONTEXT), 'next_cursor', None
+            )
+            if cursor is not None:
+                requests.append(dict(after=cursor))
+            for params in requests:
+                _, plans = self.get_plans(url, **params)
+                for sql, plan in plans.items():
+                    with self.subTest(url=url, params=params, sql=sql):
+                        for step in plan:
+                            self.assertNotIn('TEMP B-TREE', step)
+                            self.assertIsNone(self.FULL_SCAN.search(step))
+
 
 class FollowingTest(TestCase):
     @classmethod
@@ -333,6 +1146,7 @@ class FollowingTest(TestCase):
         self.follower_client.force_login(self.follower)
 
         self.guest_client = Client()
+        cache.clear()
 
     def test_following(self):
         '''Проверка создания подписки'''
@@ -389,3 +1203,145 @@ class FollowingTest(TestCase):
         )
         response = self.follower_client.get(self.FOLLOW_INDEX)
         self.assertNotIn(new_post, response.context[self.CONTEXT])
+
+    def test_follow_backfills_timeline(self):
+        '''После подписки в ленте появляются прежние записи автора'''
+        old_post = Post.objects.create(
+            author=self.author,
+            text='Пост до подписки',
+        )
+        self.follower_client.get(self.FOLLOW)
+        response = self.follower_client.get(self.FOLLOW_INDEX)
+        self.assertIn(old_post, response.context[self.CONTEXT])
+
+    def test_unfollow_clears_timeline(self):
+        '''После отписки записи автора пропадают из ленты'''
+        self.follower_client.get(self.FOLLOW)
+        post = Post.objects.create(
+            author=self.author,
+            text='Пост для проверки отписки',
+        )
+        self.follower_client.get(self.UNFOLLOW)
+        self.assertFalse(
+            TimelineEntry.objects.filter(user=self.follower).exists()
+        )
+        response = self.follower_client.get(self.FOLLOW_INDEX)
+        self.assertNotIn(post, response.context[self.CONTEXT])
+
+    @override_settings(TIMELINE_LENGTH=2)
+    def test_timeline_trimmed(self):
+        '''Лента подписок обрезается до TIMELINE_LENGTH записей'''
+        posts = [
+            Post.objects.create(author=self.author, text=f'Пост №{i}')
+            for i in range(3)
+        ]
+        self.follower_client.get(self.FOLLOW)
+        self.assertEqual(
+            list(
+                TimelineEntry.objects.filter(
+                    user=self.follower
+                ).values_list('post', flat=True)
+            ),
+            [posts[2].pk, posts[1].pk],
+        )
+
+    @override_settings(TIMELINE_LENGTH=2, TIMELINE_TRIM_EVERY=1)
+    def test_timeline_trimmed_on_fan_out(self):
+        '''Рассылка новых записей тоже обрезает ленту подписчика'''
+        self.follower_client.get(self.FOLLOW)
+        posts = [
+            Post.objects.create(author=self.author, text=f'Пост №{i}')
+            for i in range(3)
+        ]
+        self.assertEqual(
+            list(
+                TimelineEntry.objects.filter(
+                    user=self.follower
+                ).values_list('post', flat=True)
+            ),
+            [posts[2].pk, posts[1].pk],
+        )
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=0)
+    def test_pulled_author_not_fanned_out(self):
+        '''Посты популярных авторов подмешиваются в ленту при чтении'''
+        self.follower_client.get(self.FOLLOW)
+        post = Post.objects.create(
+            author=self.author,
+            text='Пост популярного автора',
+        )
+        self.assertFalse(
+            TimelineEntry.objects.filter(user=self.follower).exists()
+        )
+        response = self.follower_client.get(self.FOLLOW_INDEX)
+        self.assertIn(post, response.context[self.CONTEXT])
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=1)
+    def test_pulled_author_pushed_again(self):
+        '''Автор, потерявший подписчиков, снова рассылает посты в ленты'''
+        other = User.objects.create_user(username='other_follower')
+        Follow.objects.create(user=self.follower, author=self.author)
+        Follow.objects.create(user=other, author=self.author)
+        cache.clear()
+        post = Post.objects.create(
+            author=self.author,
+            text='Пост популярного автора',
+        )
+        self.assertFalse(TimelineEntry.objects.filter(post=post).exists())
+
+        Follow.objects.filter(user=other).delete()
+        cache.clear()
+        self.assertEqual(
+            list(
+                TimelineEntry.objects.filter(post=post).values_list(
+                    'user', flat=True
+                )
+            ),
+            [self.follower.pk],
+        )
+        response = self.follower_client.get(self.FOLLOW_INDEX)
+        self.assertIn(post, response.context[self.CONTEXT])
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=1)
+    def test_pushed_and_pulled_posts_merged(self):
+        '''Лента подписок объединяет обе ленты без пропусков и повторов'''
+        pushed_author = User.objects.create_user(username='pushed_author')
+        Follow.objects.create(user=self.follower, author=pushed_author)
+        Follow.objects.create(user=self.follower, author=self.author)
+        Follow.objects.create(user=pushed_author, author=self.author)
+        cache.clear()
+
+        posts = [
+            Post.objects.create(
+                author=(self.author, pushed_author)[i % 2],
+                text=f'Пост №{i}',
+            )
+            for i in range(settings.OBJECTS_PER_PAGE + 5)
+        ]
+        self.assertFalse(
+            TimelineEntry.objects.filter(
+                user=self.follower,
+                post__author=self.author,
+            ).exists()
+        )
+
+        first_page = self.follower_client.get(
+            self.FOLLOW_INDEX
+        ).context[self.CONTEXT]
+        second_page = self.follower_client.get(
+            self.FOLLOW_INDEX, {'after': first_page.next_cursor}
+        ).context[self.CONTEXT]
+        self.assertEqual(
+            list(first_page) + list(second_page),
+            posts[::-1],
+        )
+
+        # Номера страниц заканчиваются на merged_pages, дальше курсор.
+        with mock.patch.object(MergedCursorPaginator, 'merged_pages', 1):
+            response = self.follower_client.get(self.FOLLOW_INDEX)
+            self.assertNotContains(response, '?page=2')
+            self.assertContains(response, '?after=')
+            response = self.follower_client.get(
+                self.FOLLOW_INDEX, {'page': 2}
+            )
+        self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
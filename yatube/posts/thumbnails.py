@@ -0,0 +1,229 @@
+import logging
+import threading
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import close_old_connections, transaction
+from sorl.thumbnail import default, get_thumbnail
+from sorl.thumbnail.conf import defaults as sorl_defaults
+from sorl.thumbnail.conf import settings as sorl_settings
+from sorl.thumbnail.images import ImageFile, deserialize_image_file
+from sorl.thumbnail.kvstores.base import add_prefix
+from sorl.thumbnail.kvstores import cached_db_kvstore
+from sorl.thumbnail.models import KVStore as KVStoreModel
+
+from . import feed_cache
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_executor = None
+# Image name -> pages of the posts waiting for its thumbnails.
+_pending = {}
+
+Rendition = namedtuple('Rendition', 'width format geometry options')
+
+
+def renditions(alias):
+    """Every width and format of ``POST_IMAGES[alias]``."""
+    config = settings.POST_IMAGES[alias]
+    ratio_width, ratio_height = config['ratio']
+    return [
+        Rendition(
+            width,
+            image_format,
+            f'{width}x{round(width * ratio_height / ratio_width)}',
+            {**config['options'], 'format': image_format},
+        )
+        for image_format in config['formats']
+        for width in config['widths']
+    ]
+
+
+def thumbnail_file(name, rendition):
+    """The file sorl would produce for ``rendition``, without producing it.
+
+    Mirrors the option handling of ``ThumbnailBackend.get_thumbnail`` so
+    the name, and with it the key-value store key, are the same.
+    """
+    geometry, options = rendition.geometry, rendition.options
+    source = ImageFile(name)
+    backend = default.backend
+    options = dict(options)
+    if sorl_settings.THUMBNAIL_PRESERVE_FORMAT:
+        options.setdefault('format', backend._get_format(source))
+    for key, value in backend.default_options.items():
+        options.setdefault(key, value)
+    for key, attr in backend.extra_options:
+        value = getattr(sorl_settings, attr)
+        if value != getattr(sorl_defaults, attr):
+            options.setdefault(key, value)
+    return ImageFile(
+        backend._get_thumbnail_filename(source, geometry, options),
+        default.storage,
+    )
+
+
+def failed_key(name):
+    return f'thumbnails:failed:{name}'
+
+
+def generate(name):
+    """Create every rendition of ``name``, ``False`` if that failed.
+
+    Failures are remembered for ``THUMBNAIL_FAILURE_TIMEOUT`` so pages
+    showing a broken image do not schedule it again on every view.
+    """
+    try:
+        if not default.storage.exists(name):
+            logger.warning('Нет исходной картинки %s', name)
+        else:
+            for alias in settings.POST_IMAGES:
+                for rendition in renditions(alias):
+                    get_thumbnail(
+                        name, rendition.geometry, **rendition.options
+                    )
+            return True
+    except Exception:
+        logger.exception('Не удалось создать миниатюры для %s', name)
+    cache.set(failed_key(name), True, settings.THUMBNAIL_FAILURE_TIMEOUT)
+    return False
+
+
+def post_pages(image):
+    """What ``feed_cache.bump_pages()`` needs for the post of ``image``."""
+    post = image.instance
+    return post.pk, post.author.username, (post.group_id,)
+
+
+def _run(name):
+    generated = False
+    try:
+        generated = generate(name)
+    finally:
+        with _lock:
+            pages = _pending.pop(name, ())
+        close_old_connections()
+    if generated:
+        # Cached pages and ETags still point at the original image.
+        for post_id, username, group_ids in pages:
+            feed_cache.bump_pages(post_id, username, group_ids)
+
+
+def _submit(name, pages):
+    global _executor
+    with _lock:
+        if name in _pending:
+            _pending[name].add(pages)
+            return
+        _pending[name] = {pages}
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.THUMBNAIL_WORKERS,
+                thread_name_prefix='thumbnails',
+            )
+    _executor.submit(_run, name)
+
+
+def schedule(image):
+    """Generate all ``POST_IMAGES`` renditions of ``image`` in the worker pool.
+
+    Work starts once the current transaction commits, so the workers see
+    the saved post. With ``THUMBNAIL_WORKERS = 0`` it runs right away in
+    the calling thread. A worker bumps the pages of ``image.instance``
+    once done, without looking the post up again.
+    """
+    if not image or cache.get(failed_key(image.name)):
+        return
+    if settings.THUMBNAIL_WORKERS == 0:
+        generate(image.name)
+        return
+    name, pages = image.name, post_pages(image)
+    transaction.on_commit(lambda: _submit(name, pages))
+
+
+def ready(image, alias):
+    """``[(rendition, thumbnail)]`` once all renditions are generated,
+    ``None`` until then.
+    """
+    image_files = [
+        (rendition, thumbnail_file(image.name, rendition))
+        for rendition in renditions(alias)
+    ]
+    return _complete(image_files, ready_many(
+        image_file for _, image_file in image_files
+    ))
+
+
+def _complete(image_files, found):
+    thumbnails = [
+        (rendition, found.get(image_file.key))
+        for rendition, image_file in image_files
+    ]
+    if not all(thumbnail for _, thumbnail in thumbnails):
+        return None
+    return thumbnails
+
+
+def ready_many(image_files):
+    """``{key: thumbnail}`` of the ready ones among ``image_files``.
+
+    With sorl's cached-db store this is one ``get_many`` and at most one
+    query for the cache misses, which are then cached the way sorl
+    caches them, empty ones included.
+    """
+    kvstore = default.kvstore
+    if not isinstance(kvstore, cached_db_kvstore.KVStore):
+        found = {
+            image_file.key: kvstore.get(image_file)
+            for image_file in image_files
+        }
+        return {key: value for key, value in found.items() if value}
+
+    keys = {
+        add_prefix(image_file.key): image_file.key
+        for image_file in image_files
+    }
+    values = kvstore.cache.get_many(keys)
+    missing = [key for key in keys if key not in values]
+    if missing:
+        rows = dict(
+            KVStoreModel.objects
+            .filter(key__in=missing)
+            .values_list('key', 'value')
+        )
+        fetched = {
+            key: rows.get(key, cached_db_kvstore.EMPTY_VALUE)
+            for key in missing
+        }
+        kvstore.cache.set_many(
+            fetched, sorl_settings.THUMBNAIL_CACHE_TIMEOUT
+        )
+        values.update(fetched)
+    return {
+        keys[key]: deserialize_image_file(value)
+        for key, value in values.items()
+        if value and value != cached_db_kvstore.EMPTY_VALUE
+    }
+
+
+def prefetch(posts, aliases):
+    """Attach ``prefetched_thumbnails`` to every post of a page."""
+    image_files = {}
+    for post in posts:
+        post.prefetched_thumbnails = {}
+        if post.image:
+            for alias in aliases:
+                image_files[post, alias] = [
+                    (rendition, thumbnail_file(post.image.name, rendition))
+                    for rendition in renditions(alias)
+                ]
+    found = ready_many(
+        image_file
+        for files in image_files.values()
+        for _, image_file in files
+    )
+    for (post, alias), files in image_files.items():
+        post.prefetched_thumbnails[alias] = _complete(files, found)
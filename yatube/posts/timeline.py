@@ -0,0 +1,188 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import F, Q, Subquery
+
+from . import bulk
+from .models import Follow, Post, TimelineEntry, UserStats
+
+PULL_AUTHORS_KEY = 'timeline:pull_authors'
+
+
+def pull_author_ids():
+    """Authors with more than TIMELINE_FANOUT_LIMIT followers.
+
+    Their posts are not copied into timelines but merged into the follow
+    feed at read time. The set is cached, and both the write and the read
+    path use the cached value, so they always agree on who is pulled.
+    """
+    author_ids = cache.get(PULL_AUTHORS_KEY)
+    if author_ids is None:
+        author_ids = set(
+            UserStats.objects.filter(
+                followers_count__gt=settings.TIMELINE_FANOUT_LIMIT
+            ).values_list('user_id', flat=True)
+        )
+        cache.set(
+            PULL_AUTHORS_KEY,
+            author_ids,
+            settings.TIMELINE_PULL_AUTHORS_TIMEOUT,
+        )
+    return author_ids
+
+
+def followed_pull_author_ids(user_id):
+    author_ids = pull_author_ids()
+    if not author_ids:
+        return []
+    return list(
+        Follow.objects.filter(
+            user_id=user_id,
+            author_id__in=author_ids,
+        ).values_list('author_id', flat=True)
+    )
+
+
+def feed_queryset(user_id, author_ids):
+    return Post.objects.for_feed().filter(
+        Q(pk__in=TimelineEntry.objects.filter(
+            user_id=user_id
+        ).values('post'))
+        | Q(author_id__in=author_ids)
+    ).annotate(feed_created=F('created'), feed_id=F('id'))
+
+
+def feed_sources(user_id, author_ids):
+    timeline = Post.objects.for_feed().filter(
+        timeline_entries__user_id=user_id
+    ).annotate(
+        feed_created=F('timeline_entries__created'),
+        feed_id=F('timeline_entries__post'),
+    )
+    return [timeline] + [
+        Post.objects.for_feed().filter(author_id=author_id).annotate(
+            feed_created=F('created'), feed_id=F('id')
+        )
+        for author_id in author_ids
+    ]
+
+
+def follower_ids(author_id):
+    return Follow.objects.filter(
+        author_id=author_id
+    ).values_list('user_id', flat=True)
+
+
+def fan_out(post, user_ids):
+    """Copy ``post`` into the timelines of ``user_ids``.
+
+    Every post also trims about one in ``TIMELINE_TRIM_EVERY`` of those
+    timelines, picked by the post id, so each of them is cut back to
+    ``TIMELINE_LENGTH`` after that many posts on average without
+    costing a DELETE per follower and post.
+    """
+    user_ids = list(user_ids)
+    TimelineEntry.objects.bulk_create(
+        (
+            TimelineEntry(user_id=user_id, post=post, created=post.created)
+            for user_id in user_ids
+        ),
+        batch_size=bulk.batch_size(
+            TimelineEntry, settings.TIMELINE_BATCH_SIZE
+        ),
+        ignore_conflicts=True,
+    )
+    every = settings.TIMELINE_TRIM_EVERY
+    for user_id in user_ids:
+        if (user_id + post.pk) % every == 0:
+            trim(user_id)
+
+
+def backfill(user_id, author_id):
+    posts = Post.objects.filter(author_id=author_id).values_list(
+        'id', 'created'
+    )[:settings.TIMELINE_LENGTH]
+    TimelineEntry.objects.bulk_create(
+        (
+            TimelineEntry(user_id=user_id, post_id=post_id, created=created)
+            for post_id, created in posts
+        ),
+        batch_size=bulk.batch_size(
+            TimelineEntry, settings.TIMELINE_BATCH_SIZE
+        ),
+        ignore_conflicts=True,
+    )
+    trim(user_id)
+
+
+def backfill_followers(author_id):
+    """Backfill the timelines of all followers of ``author_id``.
+
+    For posts inserted without signals, e.g. by ``bulk_create``.
+    Returns the ids of the updated timelines.
+    """
+    if author_id in pull_author_ids():
+        return []
+    user_ids = list(follower_ids(author_id))
+    for user_id in user_ids:
+        backfill(user_id, author_id)
+    return user_ids
+
+
+def restore_push(author_id):
+    """Fan ``author_id`` out again once they have no more than
+    TIMELINE_FANOUT_LIMIT followers.
+
+    Posts written while the author was pulled are in no timeline, so
+    they are backfilled. Returns the ids of the updated timelines.
+    """
+    if UserStats.objects.filter(
+        user_id=author_id,
+        followers_count__gt=settings.TIMELINE_FANOUT_LIMIT,
+    ).exists():
+        return []
+    cache.delete(PULL_AUTHORS_KEY)
+    return backfill_followers(author_id)
+
+
+def rebuild(user_id):
+    """Refill the timeline of ``user_id`` from every followed author.
+
+    For follows inserted without signals, e.g. by ``bulk_create``.
+    """
+    posts = Post.objects.filter(
+        author__following__user_id=user_id
+    ).exclude(
+        author_id__in=pull_author_ids()
+    ).order_by('-created', '-id').values_list(
+        'id', 'created'
+    )[:settings.TIMELINE_LENGTH]
+    TimelineEntry.objects.bulk_create(
+        (
+            TimelineEntry(user_id=user_id, post_id=post_id, created=created)
+            for post_id, created in posts
+        ),
+        batch_size=bulk.batch_size(
+            TimelineEntry, settings.TIMELINE_BATCH_SIZE
+        ),
+        ignore_conflicts=True,
+    )
+    trim(user_id)
+
+
+def remove_author(user_id, author_id):
+    TimelineEntry.objects.filter(
+        user_id=user_id,
+        post__author_id=author_id,
+    ).delete()
+
+
+def trim(user_id):
+    oldest_kept = TimelineEntry.objects.filter(user_id=user_id).order_by(
+        '-created', '-post_id'
+    ).values_list('created', flat=True)[
+        settings.TIMELINE_LENGTH - 1:settings.TIMELINE_LENGTH
+    ]
+    TimelineEntry.objects.filter(
+        user_id=user_id,
+        created__lt=Subquery(oldest_kept),
+    ).delete()
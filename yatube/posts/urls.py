@@ -1,6 +1,6 @@
 from django.urls import path
 
-from . import views
+from . import feeds, views
 
 app_name = 'posts'
 
@@ -8,11 +8,33 @@ urlpatterns = [
     path('', views.Index.as_view(), name='index'),
     path('group/<slug:slug>/', views.GroupPosts.as_view(), name='group_list'),
     path('profile/<str:username>/', views.Profile.as_view(), name='profile'),
+    path(
+        'feeds/<str:feed_format>/',
+        feeds.PostFeed.as_view(),
+        name='feed'
+    ),
+    path(
+        'group/<slug:slug>/feeds/<str:feed_format>/',
+        feeds.GroupFeed.as_view(),
+        name='group_feed'
+    ),
+    path(
+        'profile/<str:username>/feeds/<str:feed_format>/',
+        feeds.ProfileFeed.as_view(),
+        name='profile_feed'
+    ),
     path(
         'posts/<int:post_id>/',
         views.PostDetail.as_view(),
         name='post_detail'
     ),
+    path(
+        'posts/<int:post_id>/comments/',
+        views.PostComments.as_view(),
+        name='post_comments'
+    ),
+    path('search/', views.Search.as_view(), name='search'),
+    path('suggest/', views.suggest, name='suggest'),
     path('create/', views.PostCreate.as_view(), name='post_create'),
     path(
         'posts/<int:post_id>/edit/',
@@ -1,80 +1,196 @@
 from django.conf import settings
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.mixins import LoginRequiredMixin
+from django.http import Http404, JsonResponse
 from django.shortcuts import get_object_or_404, redirect
 from django.urls import reverse_lazy
 from django.views.generic import CreateView, DetailView, ListView, UpdateView
 
+from . import (
+    autocomplete,
+    feed_cache,
+    group_cache,
+    search,
+    thumbnails,
+    timeline,
+)
 from .forms import CommentForm, PostForm
-from .models import Follow, Group, Post, User
-
-
-class Index(ListView):
-    model = Post
+from .mixins import (
+    ConditionalGetMixin,
+    CursorPaginationMixin,
+    FeedCacheMixin,
+    ThumbnailPrefetchMixin,
+)
+from .models import Comment, Follow, Post, User, profiles
+from .paginators import (
+    CursorPaginator,
+    MergedCursorPaginator,
+    feed_count_key,
+)
+
+
+class Index(
+    ConditionalGetMixin,
+    ThumbnailPrefetchMixin,
+    FeedCacheMixin,
+    CursorPaginationMixin,
+    ListView,
+):
+    queryset = Post.objects.for_feed()
     template_name = 'posts/index.html'
     paginate_by = settings.OBJECTS_PER_PAGE
+    feed_name = 'index'
+
+    def get_etag_parts(self):
+        return [*super().get_etag_parts(), feed_cache.generation()]
+
+    def get_count_key(self):
+        return feed_count_key('index')
 
 
-class GroupPosts(ListView):
+class GroupPosts(
+    ConditionalGetMixin,
+    ThumbnailPrefetchMixin,
+    CursorPaginationMixin,
+    ListView,
+):
     model = Post
     template_name = 'posts/group_list.html'
     paginate_by = settings.OBJECTS_PER_PAGE
 
+    def get_etag_parts(self):
+        group = group_cache.get_by_slug(self.kwargs['slug'])
+        if group is None:
+            return super().get_etag_parts()
+        return [
+            *super().get_etag_parts(),
+            feed_cache.group_generation(group.pk),
+        ]
+
     def get_queryset(self):
+        self.group = group_cache.get_by_slug(self.kwargs['slug'])
+        if self.group is None:
+            raise Http404('Группа не найдена')
         self.queryset = (
             Post
             .objects
-            .select_related('group')
-            .filter(group__slug=self.kwargs['slug'])
+            .for_feed()
+            .filter(group_id=self.group.pk)
         )
         return super().get_queryset()
 
+    def get_count_key(self):
+        return feed_count_key('group', self.group.pk)
+
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        context['group'] = get_object_or_404(Group, slug=self.kwargs['slug'])
+        context['group'] = self.group
         return context
 
 
-class Profile(ListView):
+class Profile(
+    ConditionalGetMixin,
+    ThumbnailPrefetchMixin,
+    CursorPaginationMixin,
+    ListView,
+):
     model = Post
     template_name = 'posts/profile.html'
     paginate_by = settings.OBJECTS_PER_PAGE
     context_object_name = 'author'
 
+    def get_etag_parts(self):
+        # Posts and follows of the author change the feed and the header,
+        # the viewer's follows change the button.
+        return [
+            *super().get_etag_parts(),
+            feed_cache.user_generation(self.kwargs['username']),
+            feed_cache.user_generation(self.request.user.get_username()),
+        ]
+
+    def get_author(self):
+        return get_object_or_404(
+            profiles(self.request.user), username=self.kwargs['username']
+        )
+
     def get_queryset(self):
+        self.author = self.get_author()
         self.queryset = (
             Post
             .objects
-            .select_related('author')
-            .filter(author__username=self.kwargs['username'])
+            .for_feed()
+            .filter(author_id=self.author.pk)
         )
         return super().get_queryset()
 
+    def get_count_key(self):
+        return feed_count_key('author', self.author.pk)
+
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        author = get_object_or_404(User, username=self.kwargs['username'])
-        context['author'] = author
+        context['author'] = self.author
+        context['following'] = self.author.is_followed
+        return context
+
 
-        following = False
-        if self.request.user.is_authenticated:
-            following = self.request.user.follower.filter(
-                author=author).exists()
-        context['following'] = following
+class Search(ListView):
+    template_name = 'posts/search.html'
+    paginate_by = settings.OBJECTS_PER_PAGE
+
+    def get_queryset(self):
+        self.query = self.request.GET.get('q', '').strip()
+        if search.is_available():
+            return search.SearchResults(self.query)
+        if not self.query:
+            return Post.objects.none()
+        return Post.objects.for_feed().filter(text__icontains=self.query)
 
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['query'] = self.query
         return context
 
 
-class PostDetail(DetailView):
-    model = Post
+class PostDetail(ConditionalGetMixin, DetailView):
+    queryset = Post.objects.select_related('author__stats', 'group')
     template_name = 'posts/post_detail.html'
     paginate_by = settings.OBJECTS_PER_PAGE
     pk_url_kwarg = 'post_id'
     context_object_name = 'post'
 
+    def get_etag_parts(self):
+        # Only the post and its comments: finding the author would cost a
+        # query, so their post total in the header may lag behind.
+        return [
+            *super().get_etag_parts(),
+            feed_cache.post_generation(self.kwargs['post_id']),
+        ]
+
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context['form'] = CommentForm()
-        context['comments'] = self.object.comments.all()
+        comments_page = CursorPaginator(
+            Comment.objects.for_post(self.object.pk),
+            settings.COMMENTS_PER_PAGE,
+        ).cursor_page()
+        context['comments_page'] = comments_page
+        context['comments'] = comments_page.object_list
+        return context
+
+
+class PostComments(CursorPaginationMixin, ListView):
+    template_name = 'posts/includes/comment_list.html'
+    paginate_by = settings.COMMENTS_PER_PAGE
+    context_object_name = 'comments'
+    numbered_pages = False
+
+    def get_queryset(self):
+        return Comment.objects.for_post(self.kwargs['post_id'])
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['post_id'] = self.kwargs['post_id']
+        context['comments_page'] = context['page_obj']
         return context
 
 
@@ -86,6 +202,7 @@ class PostCreate(LoginRequiredMixin, CreateView):
         self.object = form.save(commit=False)
         self.object.author = self.request.user
         self.object.save()
+        thumbnails.schedule(self.object.image)
         return super().form_valid(form)
 
     def get_success_url(self):
@@ -112,6 +229,12 @@ class PostEdit(LoginRequiredMixin, UpdateView):
         context['is_edit'] = True
         return context
 
+    def form_valid(self, form):
+        response = super().form_valid(form)
+        if 'image' in form.changed_data:
+            thumbnails.schedule(self.object.image)
+        return response
+
     def get_success_url(self):
         return reverse_lazy(
             'posts:post_detail',
@@ -119,19 +242,51 @@ class PostEdit(LoginRequiredMixin, UpdateView):
         )
 
 
-class FollowIndex(LoginRequiredMixin, ListView):
+class FollowIndex(
+    LoginRequiredMixin,
+    ConditionalGetMixin,
+    ThumbnailPrefetchMixin,
+    CursorPaginationMixin,
+    ListView,
+):
     model = Post
     template_name = 'posts/follow.html'
     paginate_by = settings.OBJECTS_PER_PAGE
+    paginator_class = MergedCursorPaginator
+    cursor_keys = ('feed_created', 'feed_id')
+
+    def get_etag_parts(self):
+        # Posts of every followed author land here, so the feed goes with
+        # the common generation like the index does.
+        return [
+            *super().get_etag_parts(),
+            feed_cache.generation(),
+            feed_cache.user_generation(self.request.user.username),
+        ]
 
     def get_queryset(self):
-        self.queryset = (
-            Post
-            .objects
-            .filter(author__following__user=self.request.user)
-        )
+        user_id = self.request.user.pk
+        self.pull_author_ids = timeline.followed_pull_author_ids(user_id)
+        self.queryset = timeline.feed_queryset(user_id, self.pull_author_ids)
         return super().get_queryset()
 
+    def get_paginator(self, *args, **kwargs):
+        return super().get_paginator(
+            *args,
+            sources=timeline.feed_sources(
+                self.request.user.pk, self.pull_author_ids
+            ),
+            **kwargs,
+        )
+
+    def get_count_key(self):
+        return feed_count_key('follow', self.request.user.pk)
+
+    def get_count_version(self):
+        # Posts of pulled authors reach no timeline and drop no follow
+        # count key, the cached count follows their generations instead.
+        return feed_cache.author_posts_generations(self.pull_author_ids)
+
 
 @login_required
 def add_comment(request, post_id):
@@ -163,3 +318,11 @@ def profile_unfollow(request, username):
         author=get_object_or_404(User, username=username),
     ).delete()
     return redirect('posts:profile', username)
+
+
+def suggest(request):
+    query = request.GET.get('q', '').strip()
+    results = []
+    if query:
+        results = autocomplete.suggest(query, settings.AUTOCOMPLETE_LIMIT)
+    return JsonResponse({'results': results})
@@ -11,15 +11,57 @@ EMAIL_BACKEND = 'django.core.mail.backends.filebased.EmailBackend'
 EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
 
 OBJECTS_PER_PAGE = 10
+COMMENTS_PER_PAGE = 20
+
+FEED_COUNT_CACHE_TIMEOUT = 60 * 15
+FEED_COUNT_ESTIMATE_THRESHOLD = 10000
+FEED_CACHE_TIMEOUT = 60 * 60 * 6
+GROUP_CACHE_TIMEOUT = 60 * 5
+
+SYNDICATION_ITEMS = 20
+
+API_PAGE_SIZE = 20
+
+SEARCH_MAX_RESULTS = 1000
+SEARCH_SNIPPET_TOKENS = 16
+
+POST_IMAGES = {
+    'card': {
+        'ratio': (960, 339),
+        'widths': (480, 960, 1440),
+        # The last format is the <img> fallback, the others <source>s.
+        'formats': ('WEBP', 'JPEG'),
+        'sizes': '(min-width: 1200px) 960px, 100vw',
+        'options': {'crop': 'center', 'upscale': True, 'quality': 80},
+    },
+}
+
+AUTOCOMPLETE_LIMIT = 10
+AUTOCOMPLETE_TIMEOUT = 60 * 10
+
+TIMELINE_LENGTH = 1000
+TIMELINE_BATCH_SIZE = 1000
+TIMELINE_TRIM_EVERY = 100
+TIMELINE_FANOUT_LIMIT = 10000
+TIMELINE_PULL_AUTHORS_TIMEOUT = 60 * 5
 
 CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+MEDIA_MAX_AGE = 60 * 60 * 24 * 30
+# None to send files from Django, 'x-accel-redirect' for nginx or
+# 'x-sendfile' for Apache mod_xsendfile.
+MEDIA_SENDFILE = None
+MEDIA_ACCEL_REDIRECT_PREFIX = '/protected-media/'
 
 DEBUG = True
 # DEBUG = False
 
+# Thumbnails are made inline in development and in a pool in production.
+THUMBNAIL_WORKERS = 0 if DEBUG else 4
+THUMBNAIL_FAILURE_TIMEOUT = 60 * 60
+
 ALLOWED_HOSTS = [
     'localhost',
     '127.0.0.1',
@@ -47,6 +89,7 @@ INSTALLED_APPS = [
     'users.apps.UsersConfig',
     'core.apps.CoreConfig',
     'about.apps.AboutConfig',
+    'api.apps.ApiConfig',
     'sorl.thumbnail',
 ]
 